@@ -0,0 +1,380 @@
+"""Test obciążeniowy całego API na lokalnym stosie (uvicorn + Postgres z .env + fake FCM).
+
+Zakłada kamery bezpośrednio w bazie, użytkowników przez /users/register, łączy je
+przez /device/register-device, a potem przez --duration sekund odtwarza ruch:
+klatki z kamer, metadane nagrań, odpytywanie listy nagrań z aplikacji, logowania
+i CRUD zaufanych osób. Wynik (przepustowość, p50/p95/p99 na endpoint) trafia do
+benchmarks/results/<label>-<data>.json; --compare porównuje z wcześniejszym plikiem.
+
+Wymaga działającego Postgresa z DATABASE_URL (migracje wykonuje start API).
+
+Uruchomienie:
+    python -m benchmarks.api_load --users 20 --cameras 10 --concurrency 32 --duration 60 --label 1.4.0
+    python -m benchmarks.api_load --label 1.5.0 --compare benchmarks/results/1.4.0-20261019-120000.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from uuid import uuid4
+
+import httpx
+from sqlalchemy import delete, insert, select
+
+from benchmarks.fake_fcm_server import FakeFcmConfig, start_fake_fcm_server
+from db.connector import engine, async_session
+from models.analyze import FilesAnalyze, FacesFromUser
+from models.device import Camera, CameraGroupConnector
+from models.user import User, Group, UserGroupConnector, UserNotifications
+from models.video import Video
+from models.visibility import UserCameraVisibility, UserPeer
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+PASSWORD = 'load-test-password'
+# najmniejszy poprawny nagłówek JPEG, API nie dekoduje obrazu przy zapisie
+FRAME_BYTES = bytes.fromhex('ffd8ffe000104a46494600010100000100010000ffd9')
+
+# proporcje ruchu: większość to kamery i odpytywanie listy z aplikacji
+SCENARIOS = {
+    'upload_frame': 40,
+    'save_video': 10,
+    'poll_videos': 30,
+    'timeline': 5,
+    'login': 5,
+    'verified_users': 10,
+}
+
+
+class LoadStack:
+    def __init__(self, base_url: str, prefix: str):
+        self.base_url = base_url
+        self.prefix = prefix
+        self.users = []
+        self.cameras = []
+        self.results = []
+
+    def record(self, name: str, started_at: float, response: httpx.Response | None):
+        status_code = response.status_code if response is not None else 0
+        self.results.append((name, time.perf_counter() - started_at, status_code))
+
+
+async def create_cameras(prefix: str, cameras_count: int) -> list[dict]:
+    async with async_session() as session:
+        result = await session.execute(
+            insert(Camera)
+            .values([
+                {'camera_uid': f'{prefix}-camera-{i}', 'device_ip': f'{prefix}-ip-{i}', 'device_name': f'{prefix}-camera-{i}'}
+                for i in range(cameras_count)
+            ])
+            .returning(Camera.id, Camera.camera_uid)
+        )
+        cameras = [{'id': camera_id, 'uid': camera_uid} for camera_id, camera_uid in result.all()]
+        await session.commit()
+    return cameras
+
+
+async def create_users(client: httpx.AsyncClient, stack: LoadStack, users_count: int):
+    for i in range(users_count):
+        user = {'email': f'{stack.prefix}-{i}@example.com', 'username': f'{stack.prefix}-{i}'}
+        response = await client.post('/users/register', json={**user, 'password': PASSWORD})
+        response.raise_for_status()
+        user['headers'] = {'Authorization': f"Bearer {response.json()['access_token']}"}
+        # token wysyłany do fake FCM przy nowych nagraniach
+        await client.patch('/users/notification-token', headers=user['headers'], json={'notification_token': f'token-{stack.prefix}-{i}'})
+        await client.put('/users/user-notification-update', headers=user['headers'], json={
+            'notification_new_video': True, 'notification_intruder': True, 'notification_friend': False,
+        })
+        stack.users.append(user)
+
+    # kilka osób na kamerę, jak w domu z kilkoma domownikami; każdy użytkownik
+    # musi trafić do grupy, inaczej nie zobaczy (user_peers) własnych zweryfikowanych osób
+    for i in range(max(len(stack.cameras), len(stack.users))):
+        camera = stack.cameras[i % len(stack.cameras)]
+        user = stack.users[i % len(stack.users)]
+        response = await client.post(
+            '/device/register-device/',
+            headers={'X-Device-UID': camera['uid']},
+            json={'device_name': camera['uid'], 'email': user['email']},
+        )
+        response.raise_for_status()
+
+
+async def upload_frame(client: httpx.AsyncClient, stack: LoadStack):
+    camera = random.choice(stack.cameras)
+    started_at = time.perf_counter()
+    response = await client.post(
+        '/analyze/upload-face-to-analyze/',
+        headers={'X-Device-UID': camera['uid']},
+        data={'recorded_at': datetime.now().isoformat()},
+        files={'file': ('frame.jpg', FRAME_BYTES, 'image/jpeg')},
+    )
+    stack.record('POST /analyze/upload-face-to-analyze/', started_at, response)
+
+
+async def save_video(client: httpx.AsyncClient, stack: LoadStack):
+    camera = random.choice(stack.cameras)
+    started_at = time.perf_counter()
+    response = await client.post(
+        '/videos/save-info-about-video',
+        headers={'X-Device-UID': camera['uid']},
+        json={'file_path': f'/{uuid4().hex}.mp4', 'recorded_at': datetime.now().isoformat(), 'record_length': 30},
+    )
+    stack.record('POST /videos/save-info-about-video', started_at, response)
+
+
+async def poll_videos(client: httpx.AsyncClient, stack: LoadStack):
+    # aplikacja trzyma ETag i watermark z poprzedniej odpowiedzi
+    user = random.choice(stack.users)
+    headers = dict(user['headers'])
+    if user.get('etag'):
+        headers['If-None-Match'] = user['etag']
+    params = {'since': user['watermark']} if user.get('watermark') else {}
+    started_at = time.perf_counter()
+    response = await client.get('/videos/get-videos', headers=headers, params=params)
+    stack.record('GET /videos/get-videos', started_at, response)
+    if response.status_code == 200:
+        user['etag'] = response.headers.get('etag')
+        user['watermark'] = response.json().get('watermark')
+
+
+async def timeline(client: httpx.AsyncClient, stack: LoadStack):
+    user = random.choice(stack.users)
+    started_at = time.perf_counter()
+    response = await client.get('/videos/timeline', headers=user['headers'], params={'limit': 50})
+    stack.record('GET /videos/timeline', started_at, response)
+
+
+async def login(client: httpx.AsyncClient, stack: LoadStack):
+    user = random.choice(stack.users)
+    started_at = time.perf_counter()
+    response = await client.post('/users/login', json={'email': user['email'], 'password': PASSWORD})
+    stack.record('POST /users/login', started_at, response)
+
+
+async def verified_users(client: httpx.AsyncClient, stack: LoadStack):
+    user = random.choice(stack.users)
+    name = f'osoba-{uuid4().hex[:8]}'
+
+    started_at = time.perf_counter()
+    response = await client.post(
+        '/users/add-verified-user',
+        headers=user['headers'],
+        data={'verified_user': json.dumps({'name': name})},
+        files=[('files', ('face.jpg', FRAME_BYTES, 'image/jpeg'))],
+    )
+    stack.record('POST /users/add-verified-user', started_at, response)
+
+    started_at = time.perf_counter()
+    response = await client.get('/users/get-verified-users', headers=user['headers'])
+    stack.record('GET /users/get-verified-users', started_at, response)
+    if response.status_code != 200:
+        return
+    name_hash = next((item['hash'] for item in response.json() if item['name'] == name), None)
+    if not name_hash:
+        return
+
+    started_at = time.perf_counter()
+    response = await client.put(
+        f'/users/verified-user/{name_hash}',
+        headers=user['headers'],
+        data={'verified_user': json.dumps({'name': name + '-2'})},
+    )
+    stack.record('PUT /users/verified-user/{name_hash}', started_at, response)
+
+    started_at = time.perf_counter()
+    response = await client.delete(f'/users/verified-user/{name_hash}', headers=user['headers'])
+    stack.record('DELETE /users/verified-user/{name_hash}', started_at, response)
+
+
+SCENARIO_FUNCTIONS = {
+    'upload_frame': upload_frame,
+    'save_video': save_video,
+    'poll_videos': poll_videos,
+    'timeline': timeline,
+    'login': login,
+    'verified_users': verified_users,
+}
+
+
+async def virtual_client(client: httpx.AsyncClient, stack: LoadStack, deadline: float):
+    names, weights = zip(*SCENARIOS.items())
+    while time.perf_counter() < deadline:
+        scenario = random.choices(names, weights)[0]
+        try:
+            await SCENARIO_FUNCTIONS[scenario](client, stack)
+        except httpx.HTTPError as e:
+            stack.record(f'{scenario} (błąd połączenia)', time.perf_counter(), None)
+            print(f"{scenario}: {str(e)}")
+
+
+async def cleanup(stack: LoadStack):
+    camera_ids = [camera['id'] for camera in stack.cameras]
+    async with async_session() as session:
+        result = await session.execute(select(User.id).where(User.username.like(f'{stack.prefix}-%')))
+        user_ids = result.scalars().all()
+        result = await session.execute(select(UserGroupConnector.group_id).where(UserGroupConnector.user_id.in_(user_ids)))
+        group_ids = set(result.scalars().all())
+
+        await session.execute(delete(FilesAnalyze).where(FilesAnalyze.camera_id.in_(camera_ids)))
+        await session.execute(delete(Video).where(Video.camera_id.in_(camera_ids)))
+        await session.execute(delete(FacesFromUser).where(FacesFromUser.user_id.in_(user_ids)))
+        await session.execute(delete(UserCameraVisibility).where(UserCameraVisibility.user_id.in_(user_ids)))
+        await session.execute(delete(UserPeer).where(UserPeer.user_id.in_(user_ids)))
+        await session.execute(delete(CameraGroupConnector).where(CameraGroupConnector.camera_id.in_(camera_ids)))
+        await session.execute(delete(UserGroupConnector).where(UserGroupConnector.user_id.in_(user_ids)))
+        await session.execute(delete(Group).where(Group.id.in_(group_ids)))
+        await session.execute(delete(UserNotifications).where(UserNotifications.user_id.in_(user_ids)))
+        await session.execute(delete(User).where(User.id.in_(user_ids)))
+        await session.execute(delete(Camera).where(Camera.id.in_(camera_ids)))
+        await session.commit()
+
+
+def summarize(results: list, elapsed: float) -> dict:
+    by_endpoint = {}
+    for name, duration, status_code in results:
+        by_endpoint.setdefault(name, []).append((duration, status_code))
+
+    summary = {}
+    for name, samples in sorted(by_endpoint.items()):
+        latencies_ms = sorted(duration * 1000 for duration, _ in samples)
+        error_statuses = {}
+        for _, status_code in samples:
+            if status_code == 0 or status_code >= 400:
+                error_statuses[str(status_code)] = error_statuses.get(str(status_code), 0) + 1
+        summary[name] = {
+            'requests': len(samples),
+            'errors': sum(error_statuses.values()),
+            # 429/503 z kontroli przyjmowania klatek to oczekiwane odrzucenia, nie awarie
+            'error_statuses': error_statuses,
+            'rps': len(samples) / elapsed,
+            'p50_ms': _percentile(latencies_ms, 0.50),
+            'p95_ms': _percentile(latencies_ms, 0.95),
+            'p99_ms': _percentile(latencies_ms, 0.99),
+            'max_ms': latencies_ms[-1],
+        }
+    return summary
+
+
+def _percentile(sorted_values: list[float], quantile: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * quantile))]
+
+
+def report(summary: dict, previous: dict | None):
+    print(f"{'endpoint':45} {'req':>7} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for name, stats in summary.items():
+        line = (f"{name:45} {stats['requests']:>7} {stats['errors']:>5} {stats['rps']:>8.1f} "
+                f"{stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f}")
+        before = (previous or {}).get(name)
+        if before and before['p95_ms']:
+            line += f"  p95 {(stats['p95_ms'] / before['p95_ms'] - 1) * 100:+.0f}%"
+        if stats.get('error_statuses'):
+            line += "  " + " ".join(f"{code}x{count}" for code, count in sorted(stats['error_statuses'].items()))
+        print(line)
+
+
+def save_results(label: str, args: argparse.Namespace, elapsed: float, summary: dict) -> str:
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    path = os.path.join(RESULTS_DIR, f'{label}-{datetime.now():%Y%m%d-%H%M%S}.json')
+    with open(path, 'w') as file:
+        json.dump({
+            'label': label,
+            'commit': commit,
+            'created_at': datetime.now().isoformat(),
+            'args': vars(args),
+            'elapsed_s': elapsed,
+            'endpoints': summary,
+        }, file, indent=2)
+    return path
+
+
+def start_api(port: int, fcm_endpoint: str, upload_dir: str) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        'FCM_ENDPOINT': fcm_endpoint,
+        'UPLOAD_DIR': upload_dir,
+        'THUMBNAIL_SOURCE_DIR': upload_dir,
+    }
+    return subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--port', str(port), '--log-level', 'warning'],
+        env=env,
+    )
+
+
+async def wait_until_ready(base_url: str, timeout: float = 60):
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.perf_counter() < deadline:
+            try:
+                await client.get('/metrics')
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.5)
+    raise TimeoutError(f"API nie wystartowało w {timeout} s")
+
+
+async def run(args: argparse.Namespace, base_url: str) -> tuple[float, dict]:
+    stack = LoadStack(base_url, f'load-{uuid4().hex[:8]}')
+    stack.cameras = await create_cameras(stack.prefix, args.cameras)
+    limits = httpx.Limits(max_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+            await create_users(client, stack, args.users)
+            started_at = time.perf_counter()
+            deadline = started_at + args.duration
+            await asyncio.gather(*(virtual_client(client, stack, deadline) for _ in range(args.concurrency)))
+            elapsed = time.perf_counter() - started_at
+    finally:
+        await cleanup(stack)
+        await engine.dispose()
+    return elapsed, summarize(stack.results, elapsed)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--users', type=int, default=20)
+    arg_parser.add_argument('--cameras', type=int, default=10)
+    arg_parser.add_argument('--concurrency', type=int, default=32)
+    arg_parser.add_argument('--duration', type=float, default=60, help='czas pomiaru [s]')
+    arg_parser.add_argument('--port', type=int, default=8765)
+    arg_parser.add_argument('--base-url', help='adres działającego API, domyślnie startuje lokalny uvicorn')
+    arg_parser.add_argument('--fcm-latency-ms', type=float, default=50)
+    arg_parser.add_argument('--label', default='local')
+    arg_parser.add_argument('--compare', help='plik z wcześniejszym wynikiem do porównania')
+    arg_parser.add_argument('--seed', type=int, default=1)
+    args = arg_parser.parse_args()
+    random.seed(args.seed)
+
+    api_process = None
+    base_url = args.base_url
+    if not base_url:
+        fcm_server = start_fake_fcm_server('127.0.0.1', 0, FakeFcmConfig(latency_ms=args.fcm_latency_ms))
+        upload_dir = tempfile.mkdtemp(prefix='watchdog-load-')
+        api_process = start_api(args.port, f'http://127.0.0.1:{fcm_server.server_address[1]}', upload_dir)
+        base_url = f'http://127.0.0.1:{args.port}'
+
+    try:
+        asyncio.run(wait_until_ready(base_url))
+        elapsed, summary = asyncio.run(run(args, base_url))
+    finally:
+        if api_process:
+            api_process.terminate()
+            api_process.wait()
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as file:
+            previous = json.load(file)['endpoints']
+    report(summary, previous)
+    print(f"Zapisano {save_results(args.label, args, elapsed, summary)}")
+
+
+if __name__ == '__main__':
+    main()
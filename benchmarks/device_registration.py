@@ -0,0 +1,114 @@
+"""Rejestracja kamery w dużym gospodarstwie: liczba zapytań i czas DeviceService.register_device.
+
+Tworzy w bazie (DATABASE_URL z .env) syntetycznych użytkowników w kilku grupach,
+rejestruje nową kamerę i usuwa dane po pomiarze.
+
+Uruchomienie:
+    python -m benchmarks.device_registration --users 300 --groups 5
+"""
+import argparse
+import asyncio
+import time
+from uuid import uuid4
+
+from sqlalchemy import event, delete, insert, select
+
+from db.connector import engine, async_session
+from models.device import Camera, CameraGroupConnector
+from models.user import User, Group, UserGroupConnector
+from schemas.device import RegisterDevice
+from services.device import DeviceService
+
+
+async def create_household(session, prefix: str, users_count: int, groups_count: int):
+    result = await session.execute(
+        insert(User)
+        .values([
+            {'email': f'{prefix}-{i}@example.com', 'username': f'{prefix}-{i}'}
+            for i in range(users_count)
+        ])
+        .returning(User.id)
+    )
+    user_ids = result.scalars().all()
+
+    result = await session.execute(
+        insert(Group)
+        .values([{'name': f'{prefix}-group-{i}'} for i in range(groups_count)])
+        .returning(Group.id)
+    )
+    group_ids = result.scalars().all()
+
+    # użytkownicy rozłożeni po grupach, żeby propagacja miała co robić
+    await session.execute(
+        insert(UserGroupConnector).values([
+            {'user_id': user_id, 'group_id': group_ids[i % groups_count]}
+            for i, user_id in enumerate(user_ids)
+        ])
+    )
+    # jedna osoba łączy wszystkie grupy
+    await session.execute(
+        insert(UserGroupConnector).values([
+            {'user_id': user_ids[0], 'group_id': group_id} for group_id in group_ids[1:]
+        ])
+    )
+
+    camera = Camera(camera_uid=f'{prefix}-camera', device_ip=f'{prefix}-ip', device_name=f'{prefix}-camera')
+    session.add(camera)
+    await session.commit()
+    return user_ids, group_ids, camera
+
+
+async def cleanup(session, user_ids, camera_id):
+    group_ids = select(UserGroupConnector.group_id).where(UserGroupConnector.user_id.in_(user_ids))
+    group_ids = (await session.execute(group_ids.distinct())).scalars().all()
+    await session.execute(delete(CameraGroupConnector).where(CameraGroupConnector.camera_id == camera_id))
+    await session.execute(delete(UserGroupConnector).where(UserGroupConnector.group_id.in_(group_ids)))
+    await session.execute(delete(Group).where(Group.id.in_(group_ids)))
+    await session.execute(delete(Camera).where(Camera.id == camera_id))
+    await session.execute(delete(User).where(User.id.in_(user_ids)))
+    await session.commit()
+
+
+async def run(users_count: int, groups_count: int):
+    prefix = f'bench-{uuid4().hex[:8]}'
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    async with async_session() as session:
+        user_ids, group_ids, camera = await create_household(session, prefix, users_count, groups_count)
+    try:
+        event.listen(engine.sync_engine, "before_cursor_execute", count_statement)
+        async with async_session() as session:
+            started_at = time.perf_counter()
+            status = await DeviceService(session, Camera(id=camera.id, camera_uid=camera.camera_uid)).register_device(
+                RegisterDevice(device_name=f'{prefix}-new', email=f'{prefix}-0@example.com')
+            )
+            elapsed = time.perf_counter() - started_at
+        event.remove(engine.sync_engine, "before_cursor_execute", count_statement)
+
+        async with async_session() as session:
+            connectors = await session.execute(
+                select(UserGroupConnector.id).where(UserGroupConnector.user_id.in_(user_ids))
+            )
+            connectors_count = len(connectors.all())
+
+        print(f"Użytkowników: {users_count}, grup: {groups_count}, rejestracja: {'ok' if status else 'błąd'}")
+        print(f"  czas: {elapsed * 1000:.1f} ms, zapytań SQL: {len(statements)}, powiązań użytkownik-grupa: {connectors_count}")
+    finally:
+        async with async_session() as session:
+            await cleanup(session, user_ids, camera.id)
+        await engine.dispose()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--users', type=int, default=300)
+    arg_parser.add_argument('--groups', type=int, default=5)
+    args = arg_parser.parse_args()
+    asyncio.run(run(args.users, args.groups))
+
+
+if __name__ == '__main__':
+    main()
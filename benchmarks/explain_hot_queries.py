@@ -0,0 +1,197 @@
+"""Sprawdza EXPLAIN najczęstszych zapytań: każde musi korzystać z oczekiwanego indeksu.
+
+Wymaga bazy po `alembic upgrade head` (DATABASE_URL z .env). Seq scan jest wyłączony
+na czas sprawdzenia, żeby wynik nie zależał od liczby wierszy w tabelach.
+Indeksy partycji są sprowadzane do indeksu tabeli partycjonowanej, a puste
+partycje nie są oceniane (PUSTE, gdy zapytanie trafia wyłącznie w puste tabele).
+Kończy się kodem 1, jeśli któreś zapytanie nie używa swojego indeksu.
+
+Uruchomienie:
+    python -m benchmarks.explain_hot_queries
+"""
+import asyncio
+import json
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, text, func, union_all
+
+from db.connector import engine
+from models.analyze import FilesAnalyze, FacesFromUser
+from models.device import Camera, CameraGroupConnector
+from models.user import User, UserGroupConnector, UserNotifications
+from models.video import Video
+from models.visibility import UserCameraVisibility, UserPeer
+
+
+HOT_QUERIES = [
+    (
+        # jak Analyzer.worker_job: okno ANALYZE_TASK_WINDOW po recorded_at
+        "kolejka workera",
+        select(FilesAnalyze.id, FilesAnalyze.recorded_at)
+        .filter(FilesAnalyze.pending(3600))
+        .order_by(FilesAnalyze.recorded_at)
+        .limit(10),
+        "ix_files_analyze_pending_recorded_at",
+    ),
+    (
+        # jak VideoService.get_videos_page_for_user: osobny podzapyt na kamerę
+        "timeline nagrań",
+        union_all(*[
+            select(Video)
+            .where(Video.camera_id == camera_id)
+            .order_by(Video.recorded_at.desc(), Video.id.desc())
+            .limit(51)
+            for camera_id in (1, 2)
+        ]),
+        "ix_videos_camera_id_recorded_at_id",
+    ),
+    (
+        # jak VideoService.get_videos_for_user: okno VIDEOS_LIST_DAYS po recorded_at
+        "delta sync nagrań",
+        select(Video).where(
+            Video.camera_id.in_([1, 2]),
+            Video.recorded_at >= datetime.now() - timedelta(days=90),
+            Video.saved_on_server_at > datetime.now() - timedelta(days=1)
+        ),
+        "ix_videos_camera_id_saved_on_server_at",
+    ),
+    (
+        "logowanie po e-mailu",
+        select(User).where(func.lower(User.email) == "user@example.com"),
+        "ix_users_email_lower",
+    ),
+    (
+        "logowanie po nazwie",
+        select(User).where(func.lower(User.username) == "user"),
+        "ix_users_username_lower",
+    ),
+    (
+        "kamera po uid",
+        select(Camera).where(Camera.camera_uid == "uid"),
+        "cameras_camera_uid_key",
+    ),
+    (
+        "twarze użytkownika",
+        select(FacesFromUser).where(FacesFromUser.user_id == 1, FacesFromUser.deleted == False),
+        "ix_faces_from_users_user_id",
+    ),
+    (
+        "twarze po name_hash",
+        select(FacesFromUser).where(FacesFromUser.name_hash == "hash"),
+        "ix_faces_from_users_name_hash",
+    ),
+    (
+        "grupy użytkownika",
+        select(UserGroupConnector.group_id).where(UserGroupConnector.user_id == 1),
+        "ix_user_group_connectors_user_id",
+    ),
+    (
+        "członkowie grupy",
+        select(UserGroupConnector.user_id).where(UserGroupConnector.group_id == 1),
+        "ix_user_group_connectors_group_id",
+    ),
+    (
+        "grupy kamery",
+        select(CameraGroupConnector.group_id).where(CameraGroupConnector.camera_id == 1),
+        "ix_camera_group_connectors_camera_id",
+    ),
+    (
+        "kamery grupy",
+        select(CameraGroupConnector.camera_id).where(CameraGroupConnector.group_id == 1),
+        "ix_camera_group_connectors_group_id",
+    ),
+    (
+        "ustawienia powiadomień",
+        select(UserNotifications).where(UserNotifications.user_id == 1),
+        "ix_user_notifications_user_id",
+    ),
+    (
+        "odbiorcy kamery",
+        select(UserCameraVisibility.user_id).where(UserCameraVisibility.camera_id == 1),
+        "ix_user_camera_visibility_camera_id",
+    ),
+    (
+        "sąsiedzi użytkownika",
+        select(UserPeer.user_id).where(UserPeer.peer_user_id == 1),
+        "ix_user_peers_peer_user_id",
+    ),
+]
+
+
+def _scanned_tables(plan: dict) -> set[str]:
+    tables = set()
+    if "Relation Name" in plan:
+        tables.add(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        tables |= _scanned_tables(child)
+    return tables
+
+
+def _used_indexes(plan: dict) -> set[str]:
+    indexes = set()
+    if "Index Name" in plan:
+        indexes.add(plan["Index Name"])
+    for child in plan.get("Plans", []):
+        indexes |= _used_indexes(child)
+    return indexes
+
+
+async def _describe_indexes(connection, index_names: set[str]) -> dict[str, tuple[str, bool]]:
+    # indeks -> (indeks rodzica dla indeksów partycji, czy tabela indeksu jest pusta);
+    # na tabelach partycjonowanych plan pokazuje indeksy partycji, nie indeks rodzica
+    result = await connection.execute(
+        text(
+            "SELECT idx.relname, COALESCE(parent.relname, idx.relname), tbl.relname FROM pg_class idx "
+            "JOIN pg_index ON pg_index.indexrelid = idx.oid "
+            "JOIN pg_class tbl ON tbl.oid = pg_index.indrelid "
+            "LEFT JOIN pg_inherits ON pg_inherits.inhrelid = idx.oid "
+            "LEFT JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "WHERE idx.relname = ANY(:index_names)"
+        ),
+        {"index_names": list(index_names)}
+    )
+    described = {}
+    for index_name, parent_index, table in result.all():
+        empty = await connection.execute(text(f'SELECT NOT EXISTS (SELECT 1 FROM "{table}")'))
+        described[index_name] = (parent_index, empty.scalar())
+    return described
+
+
+async def run() -> int:
+    failures = 0
+    async with engine.connect() as connection:
+        await connection.execute(text("SET enable_seqscan = off"))
+        for name, stmt, expected_index in HOT_QUERIES:
+            sql = stmt.compile(engine.sync_engine, compile_kwargs={"literal_binds": True})
+            result = await connection.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))
+            plan = result.scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            described = await _describe_indexes(connection, _used_indexes(plan[0]["Plan"]))
+            used = {parent_index for parent_index, _ in described.values()}
+            # na pustej partycji wybór indeksu przez planer niczego nie mówi, oceniamy tylko tabele z danymi
+            judged = {parent_index for parent_index, empty in described.values() if not empty}
+            if judged:
+                ok = expected_index in judged
+                status = 'OK  ' if ok else 'BRAK'
+            else:
+                ok = True
+                status = 'OK  ' if expected_index in used else 'PUSTE'
+            failures += not ok
+            # przy tabelach partycjonowanych liczba partycji w planie pokazuje, czy zadziałało przycinanie
+            tables = _scanned_tables(plan[0]["Plan"])
+            print(f"{status} {name}: oczekiwany {expected_index}, użyte {sorted(used) or '-'}, tabele {len(tables)}")
+    await engine.dispose()
+    return failures
+
+
+def main():
+    failures = asyncio.run(run())
+    if failures:
+        print(f"{failures} zapytań nie korzysta z oczekiwanego indeksu")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Lokalny serwer udający FCM HTTP v1 (POST /v1/projects/<id>/messages:send).
+
+Uruchomienie:
+    python -m benchmarks.fake_fcm_server --port 9099 --latency-ms 50 --error-rate 0.01
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from uuid import uuid4
+
+
+class FakeFcmConfig:
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0, unregistered_rate: float = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.unregistered_rate = unregistered_rate
+        # tokeny z prefiksem "dead-" zawsze dostają UNREGISTERED
+        self.dead_token_prefix = 'dead-'
+
+        self._lock = threading.Lock()
+        self.received = 0
+
+    def count(self):
+        with self._lock:
+            self.received += 1
+
+
+def _error_body(status_code: int, status: str, error_code: str | None = None) -> dict:
+    error = {'code': status_code, 'message': status, 'status': status}
+    if error_code:
+        error['details'] = [{
+            '@type': 'type.googleapis.com/google.firebase.fcm.v1.FcmError',
+            'errorCode': error_code
+        }]
+    return {'error': error}
+
+
+def make_handler(config: FakeFcmConfig):
+    class FakeFcmHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            token = payload.get('message', {}).get('token', '')
+            config.count()
+
+            delay = config.latency_ms + random.uniform(-config.jitter_ms, config.jitter_ms)
+            if delay > 0:
+                time.sleep(delay / 1000)
+
+            roll = random.random()
+            if token.startswith(config.dead_token_prefix) or roll < config.unregistered_rate:
+                self._respond(404, _error_body(404, 'NOT_FOUND', 'UNREGISTERED'))
+            elif roll < config.unregistered_rate + config.error_rate:
+                self._respond(503, _error_body(503, 'UNAVAILABLE', 'UNAVAILABLE'))
+            else:
+                self._respond(200, {'name': f'projects/watchdog/messages/{uuid4()}'})
+
+        def _respond(self, status_code: int, body: dict):
+            data = json.dumps(body).encode()
+            self.send_response(status_code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FakeFcmHandler
+
+
+def start_fake_fcm_server(host: str, port: int, config: FakeFcmConfig) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--host', default='127.0.0.1')
+    arg_parser.add_argument('--port', type=int, default=9099)
+    arg_parser.add_argument('--latency-ms', type=float, default=50)
+    arg_parser.add_argument('--jitter-ms', type=float, default=10)
+    arg_parser.add_argument('--error-rate', type=float, default=0)
+    arg_parser.add_argument('--unregistered-rate', type=float, default=0)
+    args = arg_parser.parse_args()
+
+    config = FakeFcmConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.unregistered_rate)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(config))
+    print(f"Fake FCM nasłuchuje na http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Budżet czasu importu modułów startowych (na bazie python -X importtime).
+
+Sprawdza że import API i workera nie ładuje ciężkich integracji
+i mieści się w budżecie czasu. Kod wyjścia 1 gdy budżet przekroczony.
+
+Uruchomienie:
+    python -m benchmarks.import_time_budget --budget-ms 1500
+
+Ten sam budżet egzekwuje pytest (tests/test_import_time.py, IMPORT_BUDGET_MS).
+"""
+import argparse
+import subprocess
+import sys
+
+# moduły które mają być ładowane leniwie przez utils.integrations
+FORBIDDEN_MODULES = ('firebase_admin', 'face_recognition', 'dlib', 'google.cloud', 'PIL')
+
+TARGETS = ('main', 'workers.face_detector')
+
+
+def profile_import(module: str) -> dict[str, int]:
+    # zwraca skumulowany czas importu [us] dla każdego modułu
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        print(result.stderr)
+        raise SystemExit(f"Import {module} zakończył się błędem")
+
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        cumulative[name.strip()] = int(cumulative_us)
+    return cumulative
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--budget-ms', type=float, default=1500)
+    args = arg_parser.parse_args()
+
+    failed = False
+    for target in TARGETS:
+        cumulative = profile_import(target)
+        total_ms = cumulative.get(target, 0) / 1000
+        heavy = sorted(name for name in cumulative if name.startswith(FORBIDDEN_MODULES))
+
+        print(f"{target}: {total_ms:.0f} ms (budżet {args.budget_ms:.0f} ms)")
+        for name, duration in sorted(cumulative.items(), key=lambda item: -item[1])[:10]:
+            print(f"    {duration / 1000:8.1f} ms  {name}")
+
+        if total_ms > args.budget_ms:
+            print("  przekroczony budżet czasu importu")
+            failed = True
+        if heavy:
+            print(f"  ciężkie moduły ładowane przy imporcie: {', '.join(heavy[:5])}")
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
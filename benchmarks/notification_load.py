@@ -0,0 +1,137 @@
+"""Test obciążeniowy powiadomień: N kamer x M użytkowników na lokalnym fake FCM.
+
+Symuluje dwie ścieżki:
+- detekcja twarzy w workerze (Analyzer._send_notification z łączeniem powiadomień),
+- nowe nagranie z API (dispatcher powiadomień + NotifierService.send_multicast).
+
+Uruchomienie (bez --fcm-endpoint startuje wbudowany fake FCM):
+    python -m benchmarks.notification_load --cameras 20 --users 5 --events 10 --latency-ms 50
+"""
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_fcm_server import FakeFcmConfig, start_fake_fcm_server
+from constants.models.video import VIDEO_TYPE_INTRUDER, VIDEO_TYPE_FRIEND, VIDEO_TYPE_UNKNOWN
+from models.analyze import FilesAnalyze
+from services.notification_coalescer import NotificationCoalescer
+from services.notifier import NotifierService, HttpFcmTransport, configure_notifier, notification_dispatcher, \
+    notifier_metrics
+from workers.face_detector import Analyzer
+
+
+def build_recipients(cameras_count: int, users_count: int, dead_ratio: float) -> dict[int, list]:
+    # camera_id -> [(user_id, token, dozwolone typy)], bez bazy danych
+    recipients = {}
+    allowed_types = {VIDEO_TYPE_INTRUDER, VIDEO_TYPE_FRIEND, VIDEO_TYPE_UNKNOWN}
+    dead_every = int(1 / dead_ratio) if dead_ratio else 0
+    for camera_id in range(1, cameras_count + 1):
+        recipients[camera_id] = []
+        for user_index in range(users_count):
+            user_id = camera_id * 1000 + user_index
+            prefix = 'dead-' if dead_every and user_index % dead_every == 0 else 'token-'
+            recipients[camera_id].append((user_id, f'{prefix}{user_id}', allowed_types))
+    return recipients
+
+
+class LoadTestAnalyzer(Analyzer):
+    def __init__(self, recipients: dict[int, list]):
+        self._recipients = recipients
+        self._coalescer = NotificationCoalescer({}, threading.Lock())
+
+    def _get_notification_recipients(self, task):
+        return self._recipients[task.camera_id]
+
+
+def run_detection_path(recipients: dict[int, list], events: int, interval: float) -> list[float]:
+    analyzer = LoadTestAnalyzer(recipients)
+    latencies = []
+    latencies_lock = threading.Lock()
+
+    def camera_loop(camera_id: int):
+        for _ in range(events):
+            task = FilesAnalyze(camera_id=camera_id)
+            started_at = time.perf_counter()
+            analyzer._send_notification(task, VIDEO_TYPE_INTRUDER)
+            with latencies_lock:
+                latencies.append(time.perf_counter() - started_at)
+            time.sleep(interval)
+
+    with ThreadPoolExecutor(max_workers=len(recipients)) as executor:
+        list(executor.map(camera_loop, recipients))
+    analyzer._flush_coalesced_notifications()
+    return latencies
+
+
+async def run_new_video_path(recipients: dict[int, list], events: int, interval: float) -> list[float]:
+    latencies = []
+
+    async def send(tokens, submitted_at):
+        await asyncio.to_thread(NotifierService().send_multicast, tokens, "Powiadomienie o detekcji", "Nowe nagranie")
+        latencies.append(time.perf_counter() - submitted_at)
+
+    async def camera_loop(camera_id: int):
+        tokens = {token for _, token, _ in recipients[camera_id]}
+        for _ in range(events):
+            notification_dispatcher.submit(send, tokens, time.perf_counter())
+            await asyncio.sleep(interval)
+
+    await asyncio.gather(*(camera_loop(camera_id) for camera_id in recipients))
+    await notification_dispatcher.join()
+    return latencies
+
+
+def report(name: str, elapsed: float, latencies: list[float], before: dict, after: dict):
+    sent = after['sent'] - before['sent']
+    failed = after['failed'] - before['failed']
+    errors = {
+        code: count - before['errors'].get(code, 0)
+        for code, count in after['errors'].items()
+        if count - before['errors'].get(code, 0)
+    }
+    latencies_ms = sorted(latency * 1000 for latency in latencies) or [0]
+    p95 = latencies_ms[min(len(latencies_ms) - 1, int(len(latencies_ms) * 0.95))]
+    print(f"== {name}")
+    print(f"  zdarzeń: {len(latencies)}, pushy: {sent + failed} (ok {sent}, błędy {failed}), "
+          f"czas: {elapsed:.2f} s, {(sent + failed) / elapsed:.1f} push/s")
+    print(f"  opóźnienie end-to-end: p50 {statistics.median(latencies_ms):.1f} ms, p95 {p95:.1f} ms, max {latencies_ms[-1]:.1f} ms")
+    print(f"  błędy: {errors}, nieaktywne tokeny: {after['wasted'] - before['wasted']}")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--cameras', type=int, default=10)
+    arg_parser.add_argument('--users', type=int, default=5)
+    arg_parser.add_argument('--events', type=int, default=10)
+    arg_parser.add_argument('--interval', type=float, default=0.05, help='odstęp między zdarzeniami jednej kamery [s]')
+    arg_parser.add_argument('--dead-ratio', type=float, default=0, help='udział nieaktywnych tokenów')
+    arg_parser.add_argument('--fcm-endpoint', help='adres działającego fake FCM, domyślnie startuje wbudowany')
+    arg_parser.add_argument('--latency-ms', type=float, default=50)
+    arg_parser.add_argument('--jitter-ms', type=float, default=10)
+    arg_parser.add_argument('--error-rate', type=float, default=0)
+    args = arg_parser.parse_args()
+
+    endpoint = args.fcm_endpoint
+    if not endpoint:
+        config = FakeFcmConfig(args.latency_ms, args.jitter_ms, args.error_rate)
+        server = start_fake_fcm_server('127.0.0.1', 0, config)
+        endpoint = f'http://127.0.0.1:{server.server_address[1]}'
+
+    # bez bazy danych, nieaktywne tokeny tylko liczymy
+    configure_notifier(HttpFcmTransport(endpoint), prune_dead_tokens=False)
+    recipients = build_recipients(args.cameras, args.users, args.dead_ratio)
+
+    before, started_at = notifier_metrics.stats(), time.perf_counter()
+    latencies = run_detection_path(recipients, args.events, args.interval)
+    report('detekcja (worker)', time.perf_counter() - started_at, latencies, before, notifier_metrics.stats())
+
+    before, started_at = notifier_metrics.stats(), time.perf_counter()
+    latencies = asyncio.run(run_new_video_path(recipients, args.events, args.interval))
+    report('nowe nagranie (API)', time.perf_counter() - started_at, latencies, before, notifier_metrics.stats())
+
+
+if __name__ == '__main__':
+    main()
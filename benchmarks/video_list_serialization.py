@@ -0,0 +1,80 @@
+"""Porównanie serializacji odpowiedzi /videos/get-videos.
+
+Uruchomienie:
+    python -m benchmarks.video_list_serialization --videos 5000
+"""
+import argparse
+import datetime
+import gzip
+import json
+import time
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from schemas.video import VideoList
+
+
+def build_payload(videos_count: int) -> dict:
+    now = datetime.datetime.now()
+    return {
+        'configured_devices': [
+            {'device_ip': f'10.0.0.{i}', 'device_name': f'Kamera {i}'} for i in range(3)
+        ],
+        'videos': [
+            {
+                'url': f'rtsp://10.0.0.{i % 3}:8554/vod/recordings/{i}.mp4',
+                'hash': f'{i:032x}',
+                'camera': f'Kamera {i % 3}',
+                'type': 'Unknown',
+                'importance_level': 1,
+                'recorded_at': (now - datetime.timedelta(minutes=i)).isoformat(),
+                'record_length': '30.0'
+            } for i in range(videos_count)
+        ],
+        'watermark': now.isoformat()
+    }
+
+
+def stock_path(payload: dict) -> bytes:
+    # to co robi FastAPI z response_model: walidacja, jsonable_encoder, json.dumps
+    validated = VideoList.model_validate(payload)
+    content = jsonable_encoder(validated)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def fast_path(payload: dict) -> bytes:
+    return orjson.dumps(payload)
+
+
+def measure(func, payload: dict, repeat: int) -> float:
+    started_at = time.perf_counter()
+    for _ in range(repeat):
+        func(payload)
+    return (time.perf_counter() - started_at) / repeat * 1000
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--videos', type=int, default=5000)
+    arg_parser.add_argument('--repeat', type=int, default=20)
+    # jak GZIP_COMPRESS_LEVEL w API
+    arg_parser.add_argument('--gzip-level', type=int, default=6)
+    args = arg_parser.parse_args()
+
+    payload = build_payload(args.videos)
+    body = fast_path(payload)
+
+    stock_ms = measure(stock_path, payload, args.repeat)
+    fast_ms = measure(fast_path, payload, args.repeat)
+    gzip_ms = measure(lambda p: gzip.compress(fast_path(p), compresslevel=args.gzip_level), payload, args.repeat)
+
+    print(f"Nagrań: {args.videos}")
+    print(f"  pydantic + json:  {stock_ms:8.2f} ms")
+    print(f"  orjson:           {fast_ms:8.2f} ms  (x{stock_ms / fast_ms:.1f})")
+    print(f"  orjson + gzip {args.gzip_level}:  {gzip_ms:8.2f} ms")
+    print(f"  rozmiar:          {len(body) / 1024:8.1f} KiB, po gzip {len(gzip.compress(body, compresslevel=args.gzip_level)) / 1024:.1f} KiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -11,4 +11,16 @@ def get_message_by_type(notification_type):
     for e in NOTIFICATION_TYPES:
         if e[0] == notification_type:
             return e[1]
-    return ''
\ No newline at end of file
+    return ''
+
+# okno (w sekundach) w którym kolejne powiadomienia tego samego typu
+# dla pary (użytkownik, kamera) są łączone w jedno z licznikiem
+NOTIFICATION_COOLDOWNS = {
+    VIDEO_TYPE_INTRUDER: 60,
+    VIDEO_TYPE_FRIEND: 300,
+    VIDEO_TYPE_UNKNOWN: 60,
+    VIDEO_TYPE_ANIMAL: 300,
+}
+
+def get_cooldown_by_type(notification_type):
+    return NOTIFICATION_COOLDOWNS.get(notification_type, 0)
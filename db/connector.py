@@ -1,13 +1,17 @@
+import asyncio
 import os
-import subprocess
-import sys
+import time
 
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 
-from utils.env_variables import DATABASE_URL
+from utils.env_variables import DATABASE_URL, SLOW_QUERY_MS
+from utils.profiler import log_slow_queries
 
 engine = create_async_engine(DATABASE_URL, echo=False)
+if SLOW_QUERY_MS:
+    log_slow_queries(engine.sync_engine, float(SLOW_QUERY_MS))
 async_session = async_sessionmaker(
     bind=engine,
     class_=AsyncSession,
@@ -21,26 +25,66 @@ async def get_session() -> AsyncSession:
         yield session
 
 
-async def run_migrations_once():
+# stały klucz blokady doradczej postgresa, tylko jeden proces wykonuje migracje
+MIGRATIONS_LOCK_KEY = 7_345_001
+ALEMBIC_INI_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+
+
+def _get_alembic_config():
+    from alembic.config import Config
+
+    config = Config(ALEMBIC_INI_PATH)
+    # fileConfig z alembic.ini nadpisałby loggery uvicorna
+    config.attributes["configure_logger"] = False
+    return config
+
+
+def _get_current_heads(connection) -> set:
+    from alembic.runtime.migration import MigrationContext
+
+    return set(MigrationContext.configure(connection).get_current_heads())
+
+
+async def run_migrations_once() -> dict:
+    # zwraca czasy poszczególnych kroków, do logu startu aplikacji
+    from alembic import command
+    from alembic.script import ScriptDirectory
+
+    timings = {}
     try:
-        db_url = DATABASE_URL
-        if db_url.startswith("postgresql+asyncpg://"):
-            alembic_url = db_url.replace("postgresql+asyncpg://", "postgresql://")
-            os.environ["DATABASE_URL_ALEMBIC"] = alembic_url
-
-        # upgrade bez generowania plików
-        result = subprocess.run(
-            [sys.executable, "-m", "alembic", "upgrade", "head"],
-            capture_output=True,
-            text=True
-        )
-
-        if result.returncode == 0:
-            print("Migracje zaaplikowane lub brak nowych migracji.")
-        else:
-            print(f"Błąd migracji:\n{result.stderr}")
+        started_at = time.perf_counter()
+        config = _get_alembic_config()
+        head_revisions = set(ScriptDirectory.from_config(config).get_heads())
+        timings["read_heads"] = time.perf_counter() - started_at
 
-    except Exception as e:
-        print(f"Błąd podczas uruchamiania migracji: {e}")
+        started_at = time.perf_counter()
+        async with engine.connect() as connection:
+            current_revisions = await connection.run_sync(_get_current_heads)
+        timings["check_revision"] = time.perf_counter() - started_at
 
+        if current_revisions == head_revisions:
+            print("Baza danych jest aktualna, pomijam migracje.")
+            return timings
 
+        started_at = time.perf_counter()
+        async with engine.connect() as connection:
+            await connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+            timings["wait_for_lock"] = time.perf_counter() - started_at
+            try:
+                # inny worker mógł już zmigrować bazę gdy czekaliśmy na blokadę
+                current_revisions = await connection.run_sync(_get_current_heads)
+                await connection.commit()
+                if current_revisions != head_revisions:
+                    started_at = time.perf_counter()
+                    await asyncio.to_thread(command.upgrade, config, "head")
+                    timings["upgrade"] = time.perf_counter() - started_at
+                    print("Migracje zaaplikowane.")
+                else:
+                    print("Migracje wykonał inny proces.")
+            finally:
+                await connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+                await connection.commit()
+
+    except Exception as e:
+        print(f"Błąd podczas uruchamiania migracji: {e}")
+    return timings
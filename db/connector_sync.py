@@ -2,7 +2,8 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import NullPool
 
-from utils.env_variables import DATABASE_URL
+from utils.env_variables import DATABASE_URL, SLOW_QUERY_MS
+from utils.profiler import log_slow_queries
 
 
 engine_sync = create_engine(
@@ -16,4 +17,7 @@ engine_sync = create_engine(
 # - Każde zapytanie → nowe połączenie → zamyka natychmiast
 # - Wolniejsze, ale bezpieczne dla multiprocessingu
 
+if SLOW_QUERY_MS:
+    log_slow_queries(engine_sync, float(SLOW_QUERY_MS))
+
 SessionSync = sessionmaker(bind=engine_sync, expire_on_commit=False)
@@ -1,25 +1,54 @@
+import time
+_import_started_at = time.perf_counter()
+
 from fastapi import FastAPI
 from fastapi import FastAPI
+from fastapi.middleware.gzip import GZipMiddleware
 
-from routers import user, video, analyze, device
+from routers import user, video, analyze, device, metrics
+from db.connector import engine
+from utils.cache import cache_bus
+from utils.env_variables import GZIP_MINIMUM_SIZE, GZIP_COMPRESS_LEVEL
+from utils.metrics import MetricsMiddleware, instrument_engine
+from utils.profiler import install_signal_handler
 
 
 app = FastAPI()
+_import_time = time.perf_counter() - _import_started_at
+# kompresja tylko dla dużych odpowiedzi (np. lista nagrań), małe idą bez zmian
+app.add_middleware(GZipMiddleware, minimum_size=int(GZIP_MINIMUM_SIZE), compresslevel=int(GZIP_COMPRESS_LEVEL))
+# dodany po gzip, więc jest zewnętrzny i mierzy też kompresję
+app.add_middleware(MetricsMiddleware)
+instrument_engine(engine.sync_engine)
 
 
 @app.on_event("startup")
 async def on_startup():
     # alembic revision --autogenerate -m "thumbnail_file_path"
+    started_at = time.perf_counter()
     from db.connector import run_migrations_once
-    print("Start aplikacji — uruchamiam migracje (bez generowania plików)...")
-    await run_migrations_once()
-    print("Aplikacja gotowa.")
+    install_signal_handler("api")
+    print("Start aplikacji — sprawdzam wersję bazy danych...")
+    timings = {"import": _import_time}
+    for step, duration in (await run_migrations_once()).items():
+        timings[f"migrations.{step}"] = duration
+    if cache_bus is not None:
+        await cache_bus.start()
+    timings["startup"] = time.perf_counter() - started_at
+    print("Aplikacja gotowa. Czas startu: " + ", ".join(f"{step}={duration * 1000:.0f}ms" for step, duration in timings.items()))
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    if cache_bus is not None:
+        await cache_bus.stop()
 
 
 app.include_router(user.router)
 app.include_router(video.router)
 app.include_router(analyze.router)
 app.include_router(device.router)
+app.include_router(metrics.router)
 
 from dotenv import load_dotenv
 load_dotenv()
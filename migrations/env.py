@@ -7,6 +7,8 @@ from models.device import Camera, CameraGroupConnector
 from models.video import Video
 from models.user import User, Group, UserGroupConnector, UserNotifications
 from models.analyze import FilesAnalyze, FacesFromUser
+from models.visibility import UserCameraVisibility, UserPeer
+from services.partitions import include_partition_tables
 
 from utils.env_variables import DATABASE_URL as database_url
 
@@ -19,7 +21,8 @@ if database_url and database_url.startswith("postgresql+asyncpg://"):
 if database_url:
     config.set_main_option("sqlalchemy.url", database_url)
 
-if config.config_file_name is not None:
+# przy migracji z procesu API nie ruszamy konfiguracji logowania
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
     fileConfig(config.config_file_name)
 
 def run_migrations_offline() -> None:
@@ -30,6 +33,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_name=include_partition_tables,
     )
 
     with context.begin_transaction():
@@ -45,7 +49,8 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            include_name=include_partition_tables,
         )
 
         with context.begin_transaction():
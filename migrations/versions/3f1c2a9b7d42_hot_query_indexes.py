@@ -0,0 +1,233 @@
+"""schema baseline and hot query indexes
+
+Revision ID: 3f1c2a9b7d42
+Revises:
+Create Date: 2026-10-19 10:00:00.000000
+
+Pierwsza wersjonowana migracja. Tabele tworzone są z if_not_exists, a brakujące
+kolumny, tabele widoczności i ich wypełnienie dokładane są do istniejących tabel,
+więc na bazie postawionej wcześniej lokalną migracją (autogenerate) wystarczy
+usunąć starą rewizję i wykonać pełny upgrade:
+    alembic stamp --purge base && alembic upgrade head
+Nie stampować tej rewizji - jej upgrade zostałby pominięty i następna migracja
+(partycjonowanie) nie zadziała.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c2a9b7d42'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _create_tables() -> None:
+    op.create_table(
+        'cameras',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('device_name', sa.String(), unique=True),
+        sa.Column('activated_at', sa.DateTime()),
+        sa.Column('software_version', sa.Numeric()),
+        sa.Column('active', sa.Boolean()),
+        sa.Column('device_ip', sa.String(), unique=True),
+        sa.Column('camera_uid', sa.String(), unique=True),
+        if_not_exists=True,
+    )
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('email', sa.String(), unique=True),
+        sa.Column('username', sa.String(), unique=True),
+        sa.Column('password', sa.String()),
+        sa.Column('active', sa.Boolean()),
+        sa.Column('super_user', sa.Boolean()),
+        sa.Column('activated_at', sa.DateTime()),
+        sa.Column('token', sa.String(), unique=True),
+        sa.Column('notification_token', sa.String(), unique=True),
+        sa.Column('old_notification_token', sa.String(), unique=True),
+        if_not_exists=True,
+    )
+    op.create_table(
+        'groups',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('name', sa.String(), nullable=False),
+        if_not_exists=True,
+    )
+    op.create_table(
+        'user_group_connectors',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('group_id', sa.Integer(), sa.ForeignKey('groups.id'), nullable=False),
+        if_not_exists=True,
+    )
+    op.create_table(
+        'camera_group_connectors',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('camera_id', sa.Integer(), sa.ForeignKey('cameras.id'), nullable=False),
+        sa.Column('group_id', sa.Integer(), sa.ForeignKey('groups.id'), nullable=False),
+        if_not_exists=True,
+    )
+    op.create_table(
+        'user_notifications',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id')),
+        sa.Column('notification_new_video', sa.Boolean()),
+        sa.Column('notification_intruder', sa.Boolean()),
+        sa.Column('notification_friend', sa.Boolean()),
+        if_not_exists=True,
+    )
+    op.create_table(
+        'videos',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('recorded_at', sa.DateTime()),
+        sa.Column('saved_on_server_at', sa.DateTime()),
+        sa.Column('record_length', sa.Interval()),
+        sa.Column('type', sa.String(255)),
+        sa.Column('file_path', sa.String()),
+        sa.Column('thumbnial_file_path', sa.String()),
+        sa.Column('hash', sa.String(32), unique=True, nullable=False),
+        sa.Column('idempotency_key', sa.String()),
+        sa.Column('importance_level', sa.Numeric()),
+        sa.Column('camera_id', sa.Integer(), sa.ForeignKey('cameras.id')),
+        if_not_exists=True,
+    )
+    op.create_table(
+        'files_analyze',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('recorded_at', sa.DateTime()),
+        sa.Column('reported_at', sa.DateTime()),
+        sa.Column('file_path', sa.String()),
+        sa.Column('deleted', sa.Boolean(), nullable=False),
+        sa.Column('analyzed', sa.Boolean(), nullable=False),
+        sa.Column('reported', sa.Boolean(), nullable=False),
+        sa.Column('camera_id', sa.Integer(), sa.ForeignKey('cameras.id'), nullable=False),
+        if_not_exists=True,
+    )
+    op.create_table(
+        'faces_from_users',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('name_hash', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime()),
+        sa.Column('file_path', sa.String(), nullable=False),
+        sa.Column('hash', sa.String(36), unique=True, nullable=False),
+        sa.Column('deleted', sa.Boolean(), nullable=False),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        if_not_exists=True,
+    )
+    op.create_table(
+        'user_camera_visibility',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('camera_id', sa.Integer(), sa.ForeignKey('cameras.id', ondelete='CASCADE'), primary_key=True),
+        if_not_exists=True,
+    )
+    op.create_table(
+        'user_peers',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('peer_user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        if_not_exists=True,
+    )
+
+
+def _upgrade_existing_tables() -> None:
+    # bazy sprzed bulk ingestu nie mają klucza idempotencji
+    op.execute("ALTER TABLE videos ADD COLUMN IF NOT EXISTS idempotency_key VARCHAR")
+    op.execute("""
+        DO $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'uq_videos_camera_id_idempotency_key') THEN
+                ALTER TABLE videos
+                    ADD CONSTRAINT uq_videos_camera_id_idempotency_key UNIQUE (camera_id, idempotency_key);
+            END IF;
+        END
+        $$
+    """)
+
+
+def _create_indexes() -> None:
+    # indeksy na kluczach głównych, które autogenerate tworzył z index=True
+    for table in ('cameras', 'users', 'user_group_connectors', 'videos', 'files_analyze', 'faces_from_users'):
+        op.create_index(f'ix_{table}_id', table, ['id'], if_not_exists=True)
+
+    # kolejka workera: SELECT ... WHERE analyzed = false AND deleted = false ORDER BY recorded_at
+    op.create_index(
+        'ix_files_analyze_pending_recorded_at', 'files_analyze', ['recorded_at'],
+        postgresql_where=sa.text('analyzed = false AND deleted = false'), if_not_exists=True
+    )
+    op.create_index('ix_files_analyze_camera_id', 'files_analyze', ['camera_id'], if_not_exists=True)
+
+    # timeline (keyset) i delta sync nagrań
+    op.create_index('ix_videos_camera_id_recorded_at_id', 'videos', ['camera_id', 'recorded_at', 'id'], if_not_exists=True)
+    op.create_index('ix_videos_camera_id_saved_on_server_at', 'videos', ['camera_id', 'saved_on_server_at'], if_not_exists=True)
+
+    # klucze obce tabel łączących i ustawień powiadomień
+    op.create_index('ix_user_group_connectors_user_id', 'user_group_connectors', ['user_id'], if_not_exists=True)
+    op.create_index('ix_user_group_connectors_group_id', 'user_group_connectors', ['group_id'], if_not_exists=True)
+    op.create_index('ix_camera_group_connectors_camera_id', 'camera_group_connectors', ['camera_id'], if_not_exists=True)
+    op.create_index('ix_camera_group_connectors_group_id', 'camera_group_connectors', ['group_id'], if_not_exists=True)
+    op.create_index('ix_user_notifications_user_id', 'user_notifications', ['user_id'], if_not_exists=True)
+
+    # twarze użytkowników
+    op.create_index('ix_faces_from_users_name_hash', 'faces_from_users', ['name_hash'], if_not_exists=True)
+    op.create_index('ix_faces_from_users_user_id', 'faces_from_users', ['user_id'], if_not_exists=True)
+
+    # logowanie po e-mailu / nazwie bez rozróżniania wielkości liter
+    op.create_index('ix_users_email_lower', 'users', [sa.text('lower(email)')], if_not_exists=True)
+    op.create_index('ix_users_username_lower', 'users', [sa.text('lower(username)')], if_not_exists=True)
+
+    # odwrotne lookupy tabel widoczności
+    op.create_index('ix_user_camera_visibility_camera_id', 'user_camera_visibility', ['camera_id'], if_not_exists=True)
+    op.create_index('ix_user_peers_peer_user_id', 'user_peers', ['peer_user_id'], if_not_exists=True)
+
+
+def _backfill_visibility() -> None:
+    op.execute("""
+        INSERT INTO user_camera_visibility (user_id, camera_id)
+        SELECT DISTINCT ugc.user_id, cgc.camera_id
+        FROM user_group_connectors ugc
+        JOIN camera_group_connectors cgc ON cgc.group_id = ugc.group_id
+        ON CONFLICT DO NOTHING
+    """)
+    op.execute("""
+        INSERT INTO user_peers (user_id, peer_user_id)
+        SELECT DISTINCT ugc.user_id, peer.user_id
+        FROM user_group_connectors ugc
+        JOIN user_group_connectors peer ON peer.group_id = ugc.group_id
+        ON CONFLICT DO NOTHING
+    """)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _create_tables()
+    _upgrade_existing_tables()
+    _create_indexes()
+    _backfill_visibility()
+    op.execute("ANALYZE files_analyze")
+    op.execute("ANALYZE videos")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # tabele bazowe zostają, cofamy tylko indeksy i tabele widoczności
+    op.drop_index('ix_user_peers_peer_user_id', table_name='user_peers', if_exists=True)
+    op.drop_index('ix_user_camera_visibility_camera_id', table_name='user_camera_visibility', if_exists=True)
+    op.drop_index('ix_users_username_lower', table_name='users', if_exists=True)
+    op.drop_index('ix_users_email_lower', table_name='users', if_exists=True)
+    op.drop_index('ix_faces_from_users_user_id', table_name='faces_from_users', if_exists=True)
+    op.drop_index('ix_faces_from_users_name_hash', table_name='faces_from_users', if_exists=True)
+    op.drop_index('ix_user_notifications_user_id', table_name='user_notifications', if_exists=True)
+    op.drop_index('ix_camera_group_connectors_group_id', table_name='camera_group_connectors', if_exists=True)
+    op.drop_index('ix_camera_group_connectors_camera_id', table_name='camera_group_connectors', if_exists=True)
+    op.drop_index('ix_user_group_connectors_group_id', table_name='user_group_connectors', if_exists=True)
+    op.drop_index('ix_user_group_connectors_user_id', table_name='user_group_connectors', if_exists=True)
+    op.drop_index('ix_videos_camera_id_saved_on_server_at', table_name='videos', if_exists=True)
+    op.drop_index('ix_videos_camera_id_recorded_at_id', table_name='videos', if_exists=True)
+    op.drop_index('ix_files_analyze_camera_id', table_name='files_analyze', if_exists=True)
+    op.drop_index('ix_files_analyze_pending_recorded_at', table_name='files_analyze', if_exists=True)
+    op.drop_table('user_peers', if_exists=True)
+    op.drop_table('user_camera_visibility', if_exists=True)
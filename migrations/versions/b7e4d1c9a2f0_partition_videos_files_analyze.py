@@ -0,0 +1,154 @@
+"""monthly range partitioning of videos and files_analyze by recorded_at
+
+Revision ID: b7e4d1c9a2f0
+Revises: 3f1c2a9b7d42
+Create Date: 2026-10-19 12:00:00.000000
+
+Tabele są przepisywane: nowa tabela partycjonowana, kopia danych, podmiana nazw.
+Na dużej bazie migracja trwa proporcjonalnie do liczby wierszy i blokuje obie tabele.
+Kolejne partycje zakłada workers/partition_maintenance.py.
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e4d1c9a2f0'
+down_revision: Union[str, Sequence[str], None] = '3f1c2a9b7d42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+MONTHS_BACK = 36
+
+TABLES = {
+    'videos': {
+        'columns': """
+            id INTEGER NOT NULL DEFAULT nextval('{sequence}'),
+            recorded_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            saved_on_server_at TIMESTAMP WITHOUT TIME ZONE,
+            record_length INTERVAL,
+            type VARCHAR(255),
+            file_path VARCHAR,
+            thumbnial_file_path VARCHAR,
+            hash VARCHAR(32) NOT NULL,
+            idempotency_key VARCHAR,
+            importance_level NUMERIC,
+            camera_id INTEGER REFERENCES cameras (id)
+        """,
+        'copy_columns': "id, recorded_at, saved_on_server_at, record_length, type, file_path, "
+                        "thumbnial_file_path, hash, idempotency_key, importance_level, camera_id",
+        'copy_select': "id, COALESCE(recorded_at, saved_on_server_at, now()), saved_on_server_at, record_length, type, "
+                       "file_path, thumbnial_file_path, hash, idempotency_key, importance_level, camera_id",
+        'indexes': [
+            "ALTER TABLE videos ADD CONSTRAINT videos_pkey PRIMARY KEY (id, recorded_at)",
+            "ALTER TABLE videos ADD CONSTRAINT uq_videos_hash_recorded_at UNIQUE (hash, recorded_at)",
+            "ALTER TABLE videos ADD CONSTRAINT uq_videos_camera_id_idempotency_key "
+            "UNIQUE (camera_id, idempotency_key, recorded_at)",
+            "CREATE INDEX ix_videos_id ON videos (id)",
+            "CREATE INDEX ix_videos_camera_id_recorded_at_id ON videos (camera_id, recorded_at, id)",
+            "CREATE INDEX ix_videos_camera_id_saved_on_server_at ON videos (camera_id, saved_on_server_at)",
+        ],
+        'downgrade_indexes': [
+            "ALTER TABLE videos ADD CONSTRAINT videos_pkey PRIMARY KEY (id)",
+            "ALTER TABLE videos ADD CONSTRAINT videos_hash_key UNIQUE (hash)",
+            "ALTER TABLE videos ADD CONSTRAINT uq_videos_camera_id_idempotency_key UNIQUE (camera_id, idempotency_key)",
+            "CREATE INDEX ix_videos_id ON videos (id)",
+            "CREATE INDEX ix_videos_camera_id_recorded_at_id ON videos (camera_id, recorded_at, id)",
+            "CREATE INDEX ix_videos_camera_id_saved_on_server_at ON videos (camera_id, saved_on_server_at)",
+        ],
+    },
+    'files_analyze': {
+        'columns': """
+            id INTEGER NOT NULL DEFAULT nextval('{sequence}'),
+            recorded_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            reported_at TIMESTAMP WITHOUT TIME ZONE,
+            file_path VARCHAR,
+            deleted BOOLEAN NOT NULL,
+            analyzed BOOLEAN NOT NULL,
+            reported BOOLEAN NOT NULL,
+            camera_id INTEGER NOT NULL REFERENCES cameras (id)
+        """,
+        'copy_columns': "id, recorded_at, reported_at, file_path, deleted, analyzed, reported, camera_id",
+        'copy_select': "id, COALESCE(recorded_at, reported_at, now()), reported_at, file_path, deleted, analyzed, "
+                       "reported, camera_id",
+        'indexes': [
+            "ALTER TABLE files_analyze ADD CONSTRAINT files_analyze_pkey PRIMARY KEY (id, recorded_at)",
+            "CREATE INDEX ix_files_analyze_id ON files_analyze (id)",
+            "CREATE INDEX ix_files_analyze_camera_id ON files_analyze (camera_id)",
+            "CREATE INDEX ix_files_analyze_pending_recorded_at ON files_analyze (recorded_at) "
+            "WHERE analyzed = false AND deleted = false",
+        ],
+        'downgrade_indexes': [
+            "ALTER TABLE files_analyze ADD CONSTRAINT files_analyze_pkey PRIMARY KEY (id)",
+            "CREATE INDEX ix_files_analyze_id ON files_analyze (id)",
+            "CREATE INDEX ix_files_analyze_camera_id ON files_analyze (camera_id)",
+            "CREATE INDEX ix_files_analyze_pending_recorded_at ON files_analyze (recorded_at) "
+            "WHERE analyzed = false AND deleted = false",
+        ],
+    },
+}
+
+
+def _add_months(month: date, months: int) -> date:
+    month_index = month.year * 12 + month.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def _create_monthly_partitions(table: str, first_month: date, last_month: date, parent: str) -> None:
+    month = first_month
+    while month <= last_month:
+        op.execute(
+            f"CREATE TABLE {table}_p{month:%Y_%m} PARTITION OF {parent} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+        )
+        month = _add_months(month, 1)
+    # daty spoza zakresu (np. zły zegar kamery) trafiają do partycji domyślnej
+    op.execute(f"CREATE TABLE {table}_default PARTITION OF {parent} DEFAULT")
+
+
+def _rewrite_table(table: str, partitioned: bool) -> None:
+    spec = TABLES[table]
+    bind = op.get_bind()
+    sequence = bind.execute(sa.text(f"SELECT pg_get_serial_sequence('{table}', 'id')")).scalar()
+    # sekwencja należy do starej tabeli, bez tego DROP TABLE by ją usunął
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+
+    new_table = f"{table}_rewrite"
+    columns = spec['columns'].format(sequence=sequence)
+    if partitioned:
+        op.execute(f"CREATE TABLE {new_table} ({columns}) PARTITION BY RANGE (recorded_at)")
+        today = date.today().replace(day=1)
+        oldest = bind.execute(sa.text(f"SELECT min(recorded_at) FROM {table}")).scalar()
+        first_month = oldest.date().replace(day=1) if oldest else today
+        # starsze wiersze (albo bzdurne daty z kamer) zostają w partycji domyślnej
+        first_month = max(first_month, _add_months(today, -MONTHS_BACK))
+        _create_monthly_partitions(table, first_month, _add_months(today, MONTHS_AHEAD), new_table)
+        select_columns = spec['copy_select']
+    else:
+        op.execute(f"CREATE TABLE {new_table} ({columns})")
+        select_columns = spec['copy_columns']
+
+    op.execute(f"INSERT INTO {new_table} ({spec['copy_columns']}) SELECT {select_columns} FROM {table}")
+    op.execute(f"DROP TABLE {table} CASCADE")
+    op.execute(f"ALTER TABLE {new_table} RENAME TO {table}")
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id")
+    for statement in spec['indexes'] if partitioned else spec['downgrade_indexes']:
+        op.execute(statement)
+    op.execute(f"ANALYZE {table}")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _rewrite_table('videos', partitioned=True)
+    _rewrite_table('files_analyze', partitioned=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # DROP TABLE parent usuwa też partycje; odłączone archiwa (<tabela>_archive_*) zostają
+    _rewrite_table('videos', partitioned=False)
+    _rewrite_table('files_analyze', partitioned=False)
@@ -0,0 +1,29 @@
+"""count analysis attempts per frame
+
+Revision ID: c4d9f2a7e813
+Revises: e2a8c5f31b6d
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d9f2a7e813'
+down_revision: Union[str, Sequence[str], None] = 'e2a8c5f31b6d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # stała wartość domyślna, PostgreSQL nie przepisuje przy tym partycji
+    op.add_column('files_analyze', sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('files_analyze', 'attempts')
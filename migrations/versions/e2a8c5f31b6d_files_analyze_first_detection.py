@@ -0,0 +1,29 @@
+"""link repeated unknown-face frames to the first detection
+
+Revision ID: e2a8c5f31b6d
+Revises: b7e4d1c9a2f0
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a8c5f31b6d'
+down_revision: Union[str, Sequence[str], None] = 'b7e4d1c9a2f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # kolumna na tabeli partycjonowanej trafia do wszystkich partycji
+    op.add_column('files_analyze', sa.Column('first_detection_id', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('files_analyze', 'first_detection_id')
@@ -1,6 +1,7 @@
+import datetime
 from uuid import uuid4
 
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, select
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Index, select, text, and_
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -9,26 +10,49 @@ from db.connector import Base
 
 class FilesAnalyze(Base):
     __tablename__ = "files_analyze"
+    __table_args__ = (
+        # kolejka workera: tylko zadania do analizy, posortowane po recorded_at
+        Index(
+            "ix_files_analyze_pending_recorded_at", "recorded_at",
+            postgresql_where=text("analyzed = false AND deleted = false")
+        ),
+        # miesięczne partycje, zakładane i odłączane przez workers/partition_maintenance.py
+        {"postgresql_partition_by": "RANGE (recorded_at)"},
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
-    recorded_at = Column(DateTime)
+    # klucz partycjonowania musi być częścią klucza głównego
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    recorded_at = Column(DateTime, primary_key=True)
     reported_at = Column(DateTime)
     file_path = Column(String)
     
     deleted = Column(Boolean, nullable=False, default=False)
     analyzed = Column(Boolean, nullable=False, default=False)
     reported = Column(Boolean, nullable=False, default=False)
+    # liczba podejść workera, po ANALYZE_MAX_ATTEMPTS zadanie jest porzucane
+    attempts = Column(Integer, nullable=False, default=0, server_default='0')
 
-    camera_id = Column(Integer, ForeignKey('cameras.id'), nullable=False)
+    camera_id = Column(Integer, ForeignKey('cameras.id'), nullable=False, index=True)
     camera = relationship("Camera", back_populates="files_analyzes")
 
+    # kolejne klatki tej samej nierozpoznanej osoby wskazują na pierwszą detekcję;
+    # bez klucza obcego, bo klucz główny tabeli partycjonowanej to (id, recorded_at)
+    first_detection_id = Column(Integer)
+
+    @classmethod
+    def pending(cls, window: float):
+        # zadania do analizy z ostatnich window sekund; dolna granica recorded_at
+        # pozwala planerowi pominąć starsze partycje
+        recorded_after = datetime.datetime.now() - datetime.timedelta(seconds=window)
+        return and_(cls.analyzed == False, cls.deleted == False, cls.recorded_at >= recorded_after)
+
 
 class FacesFromUser(Base):
     __tablename__ = "faces_from_users"
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
-    name_hash = Column(String, nullable=False)
+    name_hash = Column(String, nullable=False, index=True)
 
     created_at = Column(DateTime)
     file_path = Column(String, nullable=False)
@@ -36,7 +60,7 @@ class FacesFromUser(Base):
 
     deleted = Column(Boolean, nullable=False, default=False)
 
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     user = relationship("User", back_populates="faces_from_user")
 
     async def generate_hash(self, session: AsyncSession):
@@ -24,7 +24,7 @@ class Camera(Base):
     @classmethod
     async def get_device_by_uidd(cls, session: AsyncSession, uid: str):
         result = await session.execute(
-            select(cls).filter(cls.camera_uid.like(uid))
+            select(cls).filter(cls.camera_uid == uid)
         )
         camera_query = result.scalars().all()
         
@@ -40,10 +40,10 @@ class CameraGroupConnector(Base):
     
     id = Column(Integer, primary_key=True)
 
-    camera_id = Column(Integer, ForeignKey("cameras.id"), nullable=False)    
+    camera_id = Column(Integer, ForeignKey("cameras.id"), nullable=False, index=True)
     camera = relationship("Camera", back_populates="camera_groups")
 
-    group_id = Column(Integer, ForeignKey("groups.id"), nullable=False)
+    group_id = Column(Integer, ForeignKey("groups.id"), nullable=False, index=True)
     group = relationship("Group", back_populates="cameras_group_connector")
 
     @hybrid_property
@@ -1,5 +1,5 @@
-from sqlalchemy import select, or_
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import select, or_, func
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import uuid4
@@ -31,13 +31,20 @@ class User(Base):
     faces_from_user = relationship("FacesFromUser", back_populates="user")
     user_notifications = relationship("UserNotifications", back_populates="user", uselist=False)
 
+    __table_args__ = (
+        Index("ix_users_email_lower", func.lower(email)),
+        Index("ix_users_username_lower", func.lower(username)),
+    )
+
     @classmethod
     async def get_user_by_email_or_username(cls, session: AsyncSession, email: str|None=None, username: str|None=None):
+        # lower() == lower() zamiast ilike, korzysta z indeksów funkcyjnych
+        # i nie traktuje "_" w adresie jako wildcarda
         conditions = []
         if email:
-            conditions.append(cls.email.ilike(email))
+            conditions.append(func.lower(cls.email) == email.lower())
         if username:
-            conditions.append(cls.username.ilike(username))
+            conditions.append(func.lower(cls.username) == username.lower())
         
         result = await session.execute(
             select(cls).filter(or_(*conditions))
@@ -93,10 +100,10 @@ class UserGroupConnector(Base):
 
     id = Column(Integer, primary_key=True, index=True)
 
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     user = relationship("User", back_populates="user_group_connectors")
 
-    group_id = Column(Integer, ForeignKey("groups.id"), nullable=False)
+    group_id = Column(Integer, ForeignKey("groups.id"), nullable=False, index=True)
     group = relationship("Group", back_populates="user_group_connectors")
 
 
@@ -104,7 +111,7 @@ class UserNotifications(Base):
     __tablename__ = "user_notifications"
 
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey('users.id'))
+    user_id = Column(Integer, ForeignKey('users.id'), index=True)
     
     notification_new_video = Column(Boolean, default=False)
     notification_intruder = Column(Boolean, default=False)
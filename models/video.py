@@ -1,7 +1,6 @@
 from uuid import uuid4
 
-from sqlalchemy import Column, Integer, String, Numeric, ForeignKey, DateTime, Interval, select
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Column, Integer, String, Numeric, ForeignKey, DateTime, Interval, Index, UniqueConstraint, func
 from sqlalchemy.orm import relationship
 from sqlalchemy_utils import ChoiceType
 
@@ -11,9 +10,27 @@ from constants.models.video import VIDEO_TYPES, VIDEO_TYPE_UNKNOWN
 
 class Video(Base):
     __tablename__ = "videos"
-
-    id = Column(Integer, primary_key=True, index=True)
-    recorded_at = Column(DateTime)
+    __table_args__ = (
+        # keyset pagination timeline: (camera_id, recorded_at, id)
+        Index("ix_videos_camera_id_recorded_at_id", "camera_id", "recorded_at", "id"),
+        # delta sync: (camera_id, saved_on_server_at)
+        Index("ix_videos_camera_id_saved_on_server_at", "camera_id", "saved_on_server_at"),
+        # ponowienia bulk ingestu z kamery nie tworzą duplikatów; na tabeli partycjonowanej
+        # unikalność musi obejmować klucz partycjonowania. Kompromis: ponowienie z innym
+        # recorded_at (np. po korekcie zegara kamery) zapisze drugi wiersz
+        UniqueConstraint("camera_id", "idempotency_key", "recorded_at", name="uq_videos_camera_id_idempotency_key"),
+        # hash jest unikalny tylko w obrębie recorded_at; globalnie polegamy na losowości uuid4,
+        # a odczyty po samym hashu biorą pierwszy wiersz (limit 1)
+        UniqueConstraint("hash", "recorded_at", name="uq_videos_hash_recorded_at"),
+        # miesięczne partycje, zakładane i odłączane przez workers/partition_maintenance.py
+        {"postgresql_partition_by": "RANGE (recorded_at)"},
+    )
+
+    # klucz partycjonowania musi być częścią klucza głównego
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    recorded_at = Column(DateTime, primary_key=True)
+    # czas zapisu albo ostatniej zmiany na serwerze (np. miniatury) w UTC bez strefy,
+    # watermark synchronizacji przyrostowej
     saved_on_server_at = Column(DateTime)
     record_length = Column(Interval)
     type = Column(ChoiceType(VIDEO_TYPES, impl=String(255)), default=VIDEO_TYPE_UNKNOWN)
@@ -21,7 +38,8 @@ class Video(Base):
     file_path = Column(String)
     thumbnial_file_path = Column(String)
     
-    hash = Column(String(32), unique=True, nullable=False)
+    hash = Column(String(32), nullable=False)
+    idempotency_key = Column(String)
     importance_level = Column(Numeric)
 
     camera_id = Column(Integer, ForeignKey('cameras.id'))
@@ -33,15 +51,11 @@ class Video(Base):
             return ""
         return dict(VIDEO_TYPES).get(self.type, self.type)
 
-    async def generate_hash(self, session: AsyncSession):
-        while True:
-            new_hash = str(uuid4())[-32:]
-            # Async query
-            result = await session.execute(
-                select(Video).filter(Video.hash == new_hash)
-            )
-            existing_user = result.scalars().first()
-            
-            if not existing_user:
-                self.hash = new_hash
-                break
+    @staticmethod
+    def server_timestamp():
+        # zegar bazy przeliczony na UTC: wynik nie zależy od strefy sesji bazy ani procesu API
+        return func.timezone('UTC', func.clock_timestamp())
+
+    @staticmethod
+    def new_hash() -> str:
+        return str(uuid4())[-32:]
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, ForeignKey
+
+from db.connector import Base
+
+
+# zmaterializowane wyniki łańcucha User -> UserGroupConnector -> Group -> CameraGroupConnector -> Camera,
+# utrzymywane przez DeviceService (services/visibility.py), czytane jednym indeksowanym lookupem
+class UserCameraVisibility(Base):
+    __tablename__ = "user_camera_visibility"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    camera_id = Column(Integer, ForeignKey("cameras.id", ondelete="CASCADE"), primary_key=True, index=True)
+
+
+class UserPeer(Base):
+    # para (użytkownik, użytkownik z tej samej grupy), zawiera też parę (u, u)
+    __tablename__ = "user_peers"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    peer_user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True, index=True)
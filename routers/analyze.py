@@ -4,6 +4,7 @@ from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form
 from fastapi.responses import Response
 
 from db.connector import get_session
+from services.admission import admission_controller
 from services.analyze import AnalyzeService, PseudoAnalyzeService
 from utils.auth import AuthBackend
 from models.device import Camera
@@ -16,8 +17,13 @@ router = APIRouter(
 )
 
 
+async def admit_frame_upload(session: AsyncSession = Depends(get_session), current_camera: Camera = Depends(AuthBackend().get_current_device)) -> Camera:
+    await admission_controller.admit(session, current_camera)
+    return current_camera
+
+
 @router.post("/upload-face-to-analyze/")
-async def anlyze(recorded_at: str = Form(...), file: UploadFile = File(...), session: AsyncSession = Depends(get_session), current_camera: Camera = Depends(AuthBackend().get_current_device)):
+async def anlyze(recorded_at: str = Form(...), file: UploadFile = File(...), session: AsyncSession = Depends(get_session), current_camera: Camera = Depends(admit_frame_upload)):
     if not await AnalyzeService(session, current_camera).save_file_to_analyze(file, recorded_at):
         raise HTTPException(status_code=500, detail="File not saved")
     return Response(status_code=202)
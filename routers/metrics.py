@@ -0,0 +1,55 @@
+import asyncio
+import hmac
+
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from services.admission import admission_controller
+from services.notifier import notification_dispatcher, notifier_metrics
+from services.thumbnail import thumbnail_dispatcher
+from utils.env_variables import METRICS_TOKEN
+from utils.metrics import request_metrics
+from utils.password_hasher import password_hasher
+from utils.profiler import profile, MAX_PROFILE_SECONDS
+
+
+router = APIRouter(
+    tags=['Metrics']
+)
+
+
+@router.get('/metrics')
+async def get_metrics(x_metrics_token: str | None = Header(default=None)):
+    _check_token(x_metrics_token)
+    return {
+        "routes": request_metrics.stats(),
+        "password_hasher": password_hasher.stats(),
+        "dispatchers": {
+            "notifications": notification_dispatcher.stats(),
+            "thumbnails": thumbnail_dispatcher.stats(),
+        },
+        "notifier": notifier_metrics.stats(),
+        "analyze_admission": admission_controller.stats(),
+    }
+
+
+@router.get('/metrics/profile', response_class=PlainTextResponse)
+async def get_profile(seconds: float = Query(10, gt=0, le=MAX_PROFILE_SECONDS), x_metrics_token: str | None = Header(default=None)):
+    # próbkowanie w osobnym wątku, pętla zdarzeń dalej obsługuje requesty i trafia do profilu;
+    # stosy zdradzają ścieżki i kod serwera, endpoint działa tylko ze skonfigurowanym tokenem
+    _check_token(x_metrics_token)
+    result = await asyncio.to_thread(profile, "api", seconds)
+    if result is None:
+        raise HTTPException(status_code=409, detail="Profilowanie już trwa")
+    path, stacks = result
+    return PlainTextResponse(
+        "".join(f"{stack} {count}\n" for stack, count in stacks.most_common()),
+        headers={"X-Profile-Path": path},
+    )
+
+
+def _check_token(x_metrics_token: str | None):
+    # bez skonfigurowanego tokenu endpointy są wyłączone, API stoi za proxy,
+    # więc adres klienta nie mówi czy request jest lokalny
+    if not METRICS_TOKEN or not x_metrics_token or not hmac.compare_digest(x_metrics_token, METRICS_TOKEN):
+        raise HTTPException(status_code=403)
@@ -1,15 +1,16 @@
 import os
-from fastapi import APIRouter, Depends,  Request, HTTPException
-from fastapi.responses import StreamingResponse, Response, FileResponse
+from fastapi import APIRouter, Depends,  Request, HTTPException, Query
+from fastapi.responses import StreamingResponse, Response, FileResponse, ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 
-from schemas.video import VideoList, VideoSchema
+from schemas.video import VideoList, VideoPage, VideoSchema, BulkVideoList, BulkVideoResult
 from db.connector import get_session
 from utils.auth import AuthBackend
 from models.user import User
 from models.device import Camera
 from services.video import VideoService
+from utils.env_variables import FAST_JSON_RESPONSES, THUMBNAIL_FORMAT
 
 
 router = APIRouter(
@@ -19,8 +20,58 @@ router = APIRouter(
 
 
 @router.get("/get-videos", response_model=VideoList)
-async def get_videos_list(session: AsyncSession = Depends(get_session), current_user: User = Depends(AuthBackend().get_current_user)):
-    return await VideoService(session, current_user).get_videos_for_user()
+async def get_videos_list(
+    request: Request, response: Response, since: Optional[str] = None,
+    session: AsyncSession = Depends(get_session), current_user: User = Depends(AuthBackend().get_current_user),
+):
+    video_service = VideoService(session, current_user)
+    since_at = video_service.parse_watermark(since)
+
+    etag = await video_service.get_videos_etag(since_at)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    result = await video_service.get_videos_for_user(since_at)
+    if FAST_JSON_RESPONSES:
+        # dane są już w kształcie VideoList, pomijamy ponowną walidację pydantic
+        return ORJSONResponse(result, headers={"ETag": etag})
+
+    response.headers["ETag"] = etag
+    return result
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    # If-None-Match porównuje się słabo (RFC 9110), bez prefiksu W/ i z listą tagów
+    if not if_none_match:
+        return False
+    tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+    return '*' in tags or etag.removeprefix('W/') in tags
+
+
+@router.get("/timeline", response_model=VideoPage)
+async def get_videos_timeline(
+    cursor: Optional[str] = None, limit: int = Query(50, ge=1, le=200),
+    camera: Optional[str] = None, type: Optional[str] = None,
+    session: AsyncSession = Depends(get_session), current_user: User = Depends(AuthBackend().get_current_user),
+):
+    result = await VideoService(session, current_user).get_videos_page_for_user(cursor, limit, camera, type)
+    if FAST_JSON_RESPONSES:
+        return ORJSONResponse(result)
+    return result
+
+
+@router.get("/thumbnail/{hash}")
+async def get_video_thumbnail(request: Request, hash: str, session: AsyncSession = Depends(get_session), current_user: User = Depends(AuthBackend().get_current_user)):
+    # miniatura nagrania się nie zmienia, więc hash nagrania wystarcza jako ETag
+    etag = f'"{hash}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, max-age=31536000, immutable",
+    }
+    thumbnail_path = await VideoService(session, current_user).get_thumbnail_path(hash)
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(thumbnail_path, media_type=f"image/{THUMBNAIL_FORMAT}", headers=headers)
 
 
 @router.post("/save-info-about-video")
@@ -29,3 +80,8 @@ async def save_info_about_video(video_schema: VideoSchema, session: AsyncSession
     if not video_saved:
         raise HTTPException(status_code=500, detail="Video not saved")
     return Response(status_code=201)
+
+
+@router.post("/save-info-about-videos", response_model=BulkVideoResult, status_code=201)
+async def save_info_about_videos(videos_list: BulkVideoList, session: AsyncSession = Depends(get_session), current_camera: Camera = Depends(AuthBackend().get_current_device)):
+    return await VideoService(session, current_camera=current_camera).save_info_about_videos(videos_list.videos)
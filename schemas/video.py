@@ -1,5 +1,6 @@
-from typing import List
-from pydantic import BaseModel
+from typing import List, Optional
+from dateutil import parser
+from pydantic import BaseModel, Field, validator
 
 from schemas.device import Device
 
@@ -12,14 +13,44 @@ class Video(BaseModel):
     record_length: str
     hash: str
     url: str
+    thumbnail_url: Optional[str] = None
 
 
 class VideoList(BaseModel):
     configured_devices: List[Device]
     videos: List[Video]
+    watermark: Optional[str] = None
+
+
+class VideoPage(BaseModel):
+    videos: List[Video]
+    next_cursor: Optional[str] = None
 
 
 class VideoSchema(BaseModel):
     file_path: str
     recorded_at: str
     record_length: int
+
+    @validator('recorded_at')
+    def check_recorded_at(cls, v):
+        # błędna data to 422, a nie wyjątek przy zapisie
+        try:
+            parser.isoparse(v)
+        except ValueError:
+            raise ValueError('recorded_at musi być datą ISO 8601')
+        return v
+
+
+class BulkVideoSchema(VideoSchema):
+    # domyślnie file_path, kamera może podać własny klucz
+    idempotency_key: Optional[str] = None
+
+
+class BulkVideoList(BaseModel):
+    videos: List[BulkVideoSchema] = Field(..., min_length=1, max_length=500)
+
+
+class BulkVideoResult(BaseModel):
+    inserted: int
+    duplicates: int
@@ -0,0 +1,139 @@
+import asyncio
+import datetime
+import math
+import time
+
+from fastapi import HTTPException, status
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.analyze import FilesAnalyze
+from models.device import Camera
+from utils.env_variables import ANALYZE_MAX_QUEUE, ANALYZE_MAX_TASK_AGE, ANALYZE_BACKLOG_RETRY_AFTER, \
+    ANALYZE_CAMERA_RATE, ANALYZE_CAMERA_BURST, ANALYZE_TASK_WINDOW
+
+# jak często (s) odświeżamy stan kolejki workera, zamiast zapytania przy każdej klatce
+BACKLOG_CHECK_INTERVAL = 2
+
+
+class TokenBucket:
+    # osobny kubełek na kamerę, stan w pamięci procesu (przy kilku workerach uvicorna
+    # limit dotyczy każdego z nich osobno)
+    def __init__(self, rate: float, burst: float):
+        self._rate = rate
+        self._burst = burst
+        self._buckets = {}
+
+    def take(self, key, now: float | None = None) -> float:
+        # 0 gdy jest token, inaczej liczba sekund do następnego
+        now = time.monotonic() if now is None else now
+        tokens, updated_at = self._buckets.get(key, (self._burst, now))
+        tokens = min(self._burst, tokens + (now - updated_at) * self._rate)
+        if tokens >= 1:
+            self._buckets[key] = (tokens - 1, now)
+            return 0
+        self._buckets[key] = (tokens, now)
+        return (1 - tokens) / self._rate
+
+    def refund(self, key):
+        # zwrot tokenu za klatkę odrzuconą z innego powodu niż limit kamery
+        tokens, updated_at = self._buckets.get(key, (self._burst, time.monotonic()))
+        self._buckets[key] = (min(self._burst, tokens + 1), updated_at)
+
+
+class AnalysisBacklog:
+    # liczba oczekujących zadań (policzona do max_queue + 1) i wiek najstarszego,
+    # oba z częściowego indeksu ix_files_analyze_pending_recorded_at
+    def __init__(self, max_queue: int):
+        self._max_queue = max_queue
+        self._lock = None
+        self._checked_at = None
+        self._depth = 0
+        self._oldest_recorded_at = None
+
+    async def get(self, session: AsyncSession) -> tuple[int, float]:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._checked_at is None or time.monotonic() - self._checked_at > BACKLOG_CHECK_INTERVAL:
+                await self._refresh(session)
+        oldest_age = 0.0
+        if self._oldest_recorded_at is not None:
+            oldest_age = max(0.0, (datetime.datetime.now() - self._oldest_recorded_at).total_seconds())
+        return self._depth, oldest_age
+
+    async def _refresh(self, session: AsyncSession):
+        # to samo okno co kolejka workera, klatek spoza niego worker i tak nie weźmie
+        is_pending = FilesAnalyze.pending(float(ANALYZE_TASK_WINDOW))
+        pending = select(FilesAnalyze.id).filter(is_pending)
+        result = await session.execute(
+            select(func.count()).select_from(pending.limit(self._max_queue + 1).subquery())
+        )
+        self._depth = result.scalar()
+        # wiek po recorded_at, tak jak worker układa kolejkę; zadanie, na którym worker się
+        # wywraca, po ANALYZE_MAX_ATTEMPTS wypada z kolejki i przestaje zawyżać wiek
+        result = await session.execute(
+            select(func.min(FilesAnalyze.recorded_at)).filter(is_pending)
+        )
+        self._oldest_recorded_at = result.scalar()
+        self._checked_at = time.monotonic()
+
+
+class AdmissionController:
+    # przyjmowanie klatek do analizy: najpierw limit kamery (429), potem zaległości workera (503);
+    # Retry-After pozwala firmware kamery dopasować częstotliwość wysyłania
+    def __init__(self, max_queue: int, max_task_age: float, backlog_retry_after: int, camera_rate: float, camera_burst: float):
+        self._max_queue = max_queue
+        self._max_task_age = max_task_age
+        self._backlog_retry_after = backlog_retry_after
+        self._buckets = TokenBucket(camera_rate, camera_burst)
+        self._backlog = AnalysisBacklog(max_queue)
+
+        self._admitted = 0
+        self._rate_limited = 0
+        self._rejected_queue = 0
+        self._rejected_age = 0
+
+    async def admit(self, session: AsyncSession, camera: Camera):
+        wait_time = self._buckets.take(camera.id)
+        if wait_time:
+            self._rate_limited += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Przekroczono limit klatek dla kamery",
+                headers={"Retry-After": str(math.ceil(wait_time))},
+            )
+
+        depth, oldest_age = await self._backlog.get(session)
+        if depth > self._max_queue or oldest_age > self._max_task_age:
+            # klatka nie trafi do kolejki, więc nie może zużywać limitu kamery
+            self._buckets.refund(camera.id)
+            if depth > self._max_queue:
+                self._rejected_queue += 1
+            else:
+                self._rejected_age += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Analiza nie nadąża, spróbuj ponownie później",
+                headers={"Retry-After": str(self._backlog_retry_after)},
+            )
+        self._admitted += 1
+
+    def stats(self) -> dict:
+        return {
+            "max_queue": self._max_queue,
+            "max_task_age_s": self._max_task_age,
+            "admitted": self._admitted,
+            "rate_limited": self._rate_limited,
+            "rejected_queue": self._rejected_queue,
+            "rejected_age": self._rejected_age,
+        }
+
+
+admission_controller = AdmissionController(
+    max_queue=int(ANALYZE_MAX_QUEUE),
+    max_task_age=float(ANALYZE_MAX_TASK_AGE),
+    backlog_retry_after=int(ANALYZE_BACKLOG_RETRY_AFTER),
+    camera_rate=float(ANALYZE_CAMERA_RATE),
+    camera_burst=float(ANALYZE_CAMERA_BURST),
+)
@@ -8,8 +8,9 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from models.analyze import FilesAnalyze, FacesFromUser
-from models.device import Camera, CameraGroupConnector
-from models.user import User, Group, UserGroupConnector
+from models.device import Camera
+from models.user import User
+from models.visibility import UserCameraVisibility
 from utils.env_variables import UPLOAD_DIR
 
 UPLOAD_DIR_UNKNOWN = UPLOAD_DIR + '/to_analyze'
@@ -61,11 +62,8 @@ class PseudoAnalyzeService:
     async def get_cameras_for_user(self) -> list[Camera]:
         stmt = (
             select(Camera)
-            .join(CameraGroupConnector, Camera.id == CameraGroupConnector.camera_id)
-            .join(Group, CameraGroupConnector.group_id == Group.id)
-            .join(UserGroupConnector, Group.id == UserGroupConnector.group_id)
-            .filter(UserGroupConnector.user_id == self._user.id)
-            .distinct()
+            .join(UserCameraVisibility, UserCameraVisibility.camera_id == Camera.id)
+            .filter(UserCameraVisibility.user_id == self._user.id)
         )
         result = await self._session.execute(stmt)
         return result.scalars().all()
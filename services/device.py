@@ -1,13 +1,16 @@
 from typing import Set
 import datetime
 
-from sqlalchemy import select, insert
+from sqlalchemy import select, insert, update, exists, literal, true, func
+from sqlalchemy.orm import aliased
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from models.user import User
 from schemas.device import RegisterDevice
 from models.device import Camera, CameraGroupConnector
 from models.user import User, Group, UserGroupConnector
+from services.video import VideoService
+from services.visibility import VisibilityService
 
 
 class DeviceService:
@@ -36,7 +39,9 @@ class DeviceService:
             await self._add_users_to_group_if_not_exists(target_group.id, related_users)
             await self._propagate_all_cameras_between_users(related_users)
             await self._update_group_cameras_names(target_group, request_device.device_name)
+            affected_users = await VisibilityService(self._session).refresh_for_users(related_users)
             await self._session.commit()
+            await VideoService.invalidate_cache_for_users(affected_users)
             return True
             
         except Exception as e:
@@ -61,105 +66,67 @@ class DeviceService:
         group_id: int,
         user_ids: Set[int]
     ) -> None:
-        existing_users_stmt = (
-            select(UserGroupConnector.user_id)
-            .where(UserGroupConnector.group_id == group_id)
+        existing = aliased(UserGroupConnector)
+        users_to_add = (
+            select(User.id, literal(group_id))
+            .where(
+                User.id.in_(user_ids),
+                ~exists().where(existing.user_id == User.id, existing.group_id == group_id)
+            )
         )
-        result = await self._session.execute(existing_users_stmt)
-        existing_user_ids = {row[0] for row in result.all()}
-        users_to_add = user_ids - existing_user_ids
-        
-        if not users_to_add:
-            return
-        connectors_data = [
-            {
-                'user_id': user_id,
-                'group_id': group_id
-            }
-            for user_id in users_to_add
-        ]
-        
-        stmt = insert(UserGroupConnector).values(connectors_data)
+        stmt = insert(UserGroupConnector).from_select(['user_id', 'group_id'], users_to_add)
         await self._session.execute(stmt)
-        
+
     async def _propagate_all_cameras_between_users(self, user_ids: Set[int]) -> None:
         if len(user_ids) <= 1:
             return
-        
-        all_user_groups = {}
-        
-        for user_id in user_ids:
-            user_groups_stmt = (
-                select(UserGroupConnector.group_id)
-                .where(UserGroupConnector.user_id == user_id)
-                .distinct()
-            )
-            result = await self._session.execute(user_groups_stmt)
-            all_user_groups[user_id] = {row[0] for row in result.all()}
-        
-        all_groups = set()
-        for groups in all_user_groups.values():
-            all_groups.update(groups)
-        
-        if not all_groups:
-            return
-        
-        existing_connectors_stmt = (
-            select(
-                UserGroupConnector.user_id,
-                UserGroupConnector.group_id
+
+        # każdy z użytkowników trafia do każdej grupy któregokolwiek z nich,
+        # jednym INSERT ... SELECT z anti-joinem zamiast zapytania na użytkownika
+        all_groups = (
+            select(UserGroupConnector.group_id)
+            .where(UserGroupConnector.user_id.in_(user_ids))
+            .distinct()
+            .subquery()
+        )
+        existing = aliased(UserGroupConnector)
+        connectors_to_create = (
+            select(User.id, all_groups.c.group_id)
+            .select_from(User)
+            .join(all_groups, true())
+            .where(
+                User.id.in_(user_ids),
+                ~exists().where(
+                    existing.user_id == User.id,
+                    existing.group_id == all_groups.c.group_id
+                )
             )
-            .where(UserGroupConnector.group_id.in_(all_groups))
         )
-        result = await self._session.execute(existing_connectors_stmt)
-        existing_connectors = {(row[0], row[1]) for row in result.all()}
-        
-        connectors_to_create = []
-        
-        for user_id in user_ids:
-            for group_id in all_groups:
-                if (user_id, group_id) not in existing_connectors:
-                    connectors_to_create.append({
-                        'user_id': user_id,
-                        'group_id': group_id
-                    })
-        
-        if not connectors_to_create:
-            return
-        
-        stmt = insert(UserGroupConnector).values(connectors_to_create)
+        stmt = insert(UserGroupConnector).from_select(['user_id', 'group_id'], connectors_to_create)
         await self._session.execute(stmt)
-        
+
     async def _update_group_cameras_names(self, group: Group, device_name: str) -> None:
-        stmt = select(CameraGroupConnector).where(
-            CameraGroupConnector.group_id == group.id
+        # UPDATE ... FROM camera_group_connectors zamiast SELECT na każdą kamerę
+        stmt = (
+            update(Camera)
+            .where(
+                Camera.id == CameraGroupConnector.camera_id,
+                CameraGroupConnector.group_id == group.id
+            )
+            .values(
+                device_name=f'Kamera {device_name}',
+                activated_at=func.coalesce(Camera.activated_at, datetime.datetime.now())
+            )
+            .execution_options(synchronize_session=False)
         )
-        result = await self._session.execute(stmt)
-        connectors = result.scalars().all()
-        
-        for connector in connectors:
-            camera_stmt = select(Camera).where(Camera.id == connector.camera_id)
-            camera_result = await self._session.execute(camera_stmt)
-            camera = camera_result.scalar_one_or_none()
-            
-            if camera:
-                camera.device_name = f'Kamera {device_name}'
-                if not camera.activated_at:
-                    camera.activated_at = datetime.datetime.now()
+        await self._session.execute(stmt)
         group.name = device_name
 
     async def _get_related_users(self, user_id: int) -> Set[int]:
-        user_groups_stmt = (
+        user_group_ids = (
             select(UserGroupConnector.group_id)
             .where(UserGroupConnector.user_id == user_id)
-            .distinct()
         )
-        result = await self._session.execute(user_groups_stmt)
-        user_group_ids = [row[0] for row in result.all()]
-        
-        if not user_group_ids:
-            return {user_id}
-        
         related_users_stmt = (
             select(UserGroupConnector.user_id)
             .where(UserGroupConnector.group_id.in_(user_group_ids))
@@ -168,7 +135,7 @@ class DeviceService:
         result = await self._session.execute(related_users_stmt)
         related_user_ids = {row[0] for row in result.all()}
         related_user_ids.add(user_id)
-        
+
         return related_user_ids
 
     async def _create_group(self, group_name: str) -> Group | None:
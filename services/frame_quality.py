@@ -0,0 +1,86 @@
+import os
+
+import numpy as np
+
+from utils import integrations
+
+
+REJECT_MISSING_FILE = 'missing_file'
+REJECT_UNREADABLE = 'unreadable'
+REJECT_TOO_DARK = 'too_dark'
+REJECT_TOO_BRIGHT = 'too_bright'
+REJECT_BLURRED = 'blurred'
+REJECT_NO_FACE = 'no_face'
+REJECT_FACE_TOO_SMALL = 'face_too_small'
+
+
+class FrameQualityGate:
+    # tanie sprawdzenia przed enkoderem dlib, od najtańszego: jasność, ostrość
+    # (wariancja laplasjanu), a na końcu detekcja HOG i rozmiar największej twarzy
+    def __init__(self, min_brightness: float, max_brightness: float, min_blur_variance: float, min_face_size: int):
+        self._min_brightness = min_brightness
+        self._max_brightness = max_brightness
+        self._min_blur_variance = min_blur_variance
+        self._min_face_size = min_face_size
+
+    def check(self, file_path: str) -> tuple[np.ndarray | None, tuple | None, str | None]:
+        # (obraz RGB, położenie największej twarzy, powód odrzucenia albo None)
+        if not os.path.exists(file_path):
+            return None, None, REJECT_MISSING_FILE
+
+        face_recognition = integrations.get("face_recognition")
+        try:
+            image = face_recognition.load_image_file(file_path)
+        except Exception as e:
+            print(str(e))
+            return None, None, REJECT_UNREADABLE
+
+        gray = self.to_gray(image)
+        brightness = float(gray.mean())
+        if brightness < self._min_brightness:
+            return image, None, REJECT_TOO_DARK
+        if brightness > self._max_brightness:
+            return image, None, REJECT_TOO_BRIGHT
+        if self.blur_variance(gray) < self._min_blur_variance:
+            return image, None, REJECT_BLURRED
+
+        face_locations = face_recognition.face_locations(image)
+        if not face_locations:
+            return image, None, REJECT_NO_FACE
+        # (top, right, bottom, left)
+        largest = max(face_locations, key=lambda location: (location[2] - location[0]) * (location[1] - location[3]))
+        if min(largest[2] - largest[0], largest[1] - largest[3]) < self._min_face_size:
+            return image, largest, REJECT_FACE_TOO_SMALL
+        return image, largest, None
+
+    @staticmethod
+    def to_gray(image: np.ndarray) -> np.ndarray:
+        if image.ndim == 2:
+            return image.astype(np.float32)
+        return image[..., :3].astype(np.float32) @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+    @staticmethod
+    def blur_variance(gray: np.ndarray) -> float:
+        # laplasjan 4-sąsiedztwa na wycinkach tablicy, bez OpenCV
+        if gray.shape[0] < 3 or gray.shape[1] < 3:
+            return 0.0
+        laplacian = (
+            gray[:-2, 1:-1] + gray[2:, 1:-1] + gray[1:-1, :-2] + gray[1:-1, 2:]
+            - 4 * gray[1:-1, 1:-1]
+        )
+        return float(laplacian.var())
+
+
+class FrameQualityStats:
+    # liczniki przyjętych i odrzuconych klatek, stan wspólny dla procesów zadań (Manager)
+    def __init__(self, state, lock):
+        self._state = state
+        self._lock = lock
+
+    def record(self, reason: str | None):
+        key = reason or 'accepted'
+        with self._lock:
+            self._state[key] = self._state.get(key, 0) + 1
+
+    def stats(self) -> dict:
+        return dict(self._state)
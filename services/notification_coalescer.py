@@ -0,0 +1,60 @@
+import time
+
+from constants.notifications import get_cooldown_by_type, get_message_by_type
+
+
+class NotificationCoalescer:
+    # stan jest współdzielony między procesami workera (multiprocessing.Manager),
+    # klucz to (user_id, camera_id, typ); pierwsze powiadomienie idzie od razu,
+    # kolejne w oknie cooldownu są tylko zliczane i wysyłane zbiorczo po jego końcu
+    def __init__(self, state, lock):
+        self._state = state
+        self._lock = lock
+
+    def register(self, user_id: int, camera_id: int, message_type: str, token: str, now: float | None = None) -> int:
+        # zwraca liczbę zdarzeń do wysłania teraz, 0 gdy powiadomienie zostało wstrzymane
+        now = time.time() if now is None else now
+        key = (user_id, camera_id, message_type)
+        with self._lock:
+            entry = self._state.get(key)
+            if entry is None or now >= entry['window_end']:
+                count = 1 + (entry['pending'] if entry else 0)
+                self._state[key] = self._new_entry(message_type, token, now)
+                return count
+
+            entry['pending'] += 1
+            entry['token'] = token
+            # proxy Managera nie widzi zmian w zagnieżdżonym słowniku, trzeba przypisać ponownie
+            self._state[key] = entry
+            return 0
+
+    def flush_expired(self, now: float | None = None) -> list[tuple[str, str, int]]:
+        # zbiorcze powiadomienia dla okien które się skończyły: (token, typ, liczba)
+        now = time.time() if now is None else now
+        to_send = []
+        with self._lock:
+            for key, entry in list(self._state.items()):
+                if now < entry['window_end']:
+                    continue
+                message_type = key[2]
+                if entry['pending']:
+                    to_send.append((entry['token'], message_type, entry['pending']))
+                    self._state[key] = self._new_entry(message_type, entry['token'], now)
+                else:
+                    del self._state[key]
+        return to_send
+
+    @staticmethod
+    def get_message(message_type: str, count: int) -> str:
+        message = get_message_by_type(message_type)
+        if count > 1:
+            return f'{message} ({count}x)'
+        return message
+
+    @staticmethod
+    def _new_entry(message_type: str, token: str, now: float) -> dict:
+        return {
+            'window_end': now + get_cooldown_by_type(message_type),
+            'pending': 0,
+            'token': token,
+        }
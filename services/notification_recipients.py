@@ -0,0 +1,104 @@
+import time
+from typing import Iterable
+
+from sqlalchemy import select, func
+
+# kanał LISTEN/NOTIFY postgresa, API i notifier zgłaszają na nim zmiany odbiorców,
+# worker (osobny proces) czyści na tej podstawie swój cache
+RECIPIENTS_CHANNEL = "notification_recipients"
+RECIPIENTS_ALL = "all"
+RECIPIENTS_CACHE_TTL = 300
+# limit payloadu NOTIFY to 8000 bajtów, przy dłuższej liście czyścimy wszystko
+MAX_PAYLOAD_LENGTH = 7000
+
+
+def recipients_changed(user_ids: Iterable[int] | None = None):
+    # zapytanie do wykonania w tej samej transakcji co zmiana,
+    # postgres dostarcza powiadomienie dopiero po commicie
+    payload = RECIPIENTS_ALL
+    if user_ids is not None:
+        payload = ",".join(str(user_id) for user_id in set(user_ids))
+    if len(payload) > MAX_PAYLOAD_LENGTH:
+        payload = RECIPIENTS_ALL
+    return select(func.pg_notify(RECIPIENTS_CHANNEL, payload))
+
+
+class RecipientCache:
+    # camera_id -> wszyscy użytkownicy widzący kamerę i lista (user_id, token, dozwolone typy);
+    # stan we wspólnym słowniku Managera, bo werdykty liczą się w procesach potomnych
+    def __init__(self, state, lock):
+        self._state = state
+        self._lock = lock
+
+    def get(self, camera_id: int, now: float | None = None) -> list | None:
+        now = time.time() if now is None else now
+        entry = self._state.get(camera_id)
+        if entry is None or now - entry['loaded_at'] > RECIPIENTS_CACHE_TTL:
+            return None
+        return entry['recipients']
+
+    def store(self, camera_id: int, user_ids: Iterable[int], recipients: list, now: float | None = None):
+        now = time.time() if now is None else now
+        self._state[camera_id] = {
+            'loaded_at': now,
+            'user_ids': set(user_ids),
+            'recipients': recipients,
+        }
+
+    def invalidate_users(self, user_ids: set[int]):
+        with self._lock:
+            for camera_id, entry in list(self._state.items()):
+                if entry['user_ids'] & user_ids:
+                    del self._state[camera_id]
+
+    def clear(self):
+        with self._lock:
+            self._state.clear()
+
+
+class RecipientChangesListener:
+    # osobne połączenie z LISTEN w procesie głównym workera; po zerwaniu połączenia
+    # nie wiemy co przegapiliśmy, więc cache jest czyszczony w całości
+    def __init__(self, engine):
+        self._engine = engine
+        self._connection = None
+
+    def apply(self, cache: RecipientCache):
+        try:
+            if self._connection is None:
+                self._connect()
+                cache.clear()
+
+            driver_connection = self._connection.driver_connection
+            driver_connection.poll()
+            payloads = [notify.payload for notify in driver_connection.notifies]
+            driver_connection.notifies.clear()
+        except Exception as e:
+            print(f"Błąd nasłuchu zmian odbiorców: {str(e)}")
+            self.close()
+            cache.clear()
+            return
+
+        user_ids = set()
+        for payload in payloads:
+            if payload == RECIPIENTS_ALL:
+                cache.clear()
+                return
+            user_ids.update(int(user_id) for user_id in payload.split(",") if user_id)
+        if user_ids:
+            cache.invalidate_users(user_ids)
+
+    def close(self):
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except Exception:
+                pass
+            self._connection = None
+
+    def _connect(self):
+        self._connection = self._engine.raw_connection()
+        driver_connection = self._connection.driver_connection
+        driver_connection.autocommit = True
+        with driver_connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {RECIPIENTS_CHANNEL}")
@@ -1,38 +1,55 @@
-import firebase_admin
-from firebase_admin import credentials, messaging
-from typing import List
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Iterable
 
-from utils.env_variables import FIREBASE_CERTIFICATE_PATH
+import httpx
+from sqlalchemy import update
 
-cred = credentials.Certificate(FIREBASE_CERTIFICATE_PATH)
-firebase_admin.initialize_app(cred)
+from db.connector_sync import SessionSync
+from models.user import User
+from services.notification_recipients import recipients_changed
+from utils import integrations
+from utils.background import BackgroundDispatcher
+from utils.env_variables import NOTIFICATION_WORKERS, FCM_ENDPOINT
 
-class NotifierService:
-    def send_notification(self, token: str, title: str, body: str):
-        try:
-            message = self._get_mesage_body(title, body, token)
-            response = messaging.send(message)
-            print(f"Wysłano 1 powiadomienie")
-            return response
-        except Exception as e:
-            print(str(e))
-            return 
+# limit wiadomości w jednym wywołaniu send_each
+FCM_MAX_BATCH = 500
+FCM_MAX_PARALLEL_BATCHES = 4
+# błędy po których token nigdy już nie zadziała (odinstalowana aplikacja, token innego projektu);
+# INVALID_ARGUMENT FCM zwraca też dla błędnej wiadomości, wtedy usunęlibyśmy dobre tokeny wszystkich odbiorców
+DEAD_TOKEN_ERRORS = {'UNREGISTERED', 'SENDER_ID_MISMATCH'}
 
-    def send_multicast(self, tokens: List[str], title: str, body: str):
-        try:
-            # messages = [self._get_mesage_body(title, body, token) for token in tokens]
+notification_dispatcher = BackgroundDispatcher("notifications", concurrency=int(NOTIFICATION_WORKERS), max_queue=1000)
 
-            # response = messaging.send_each(messages)
-            for token in tokens:
-                # message = self._get_mesage_body(title, body, token)
-                response = self.send_notification(token, title, body)
-            return response
-        except Exception as e:
-            print(str(e))
-            return
+
+class FirebaseTransport:
+    def send_each(self, tokens: List[str], title: str, body: str) -> List[dict]:
+        messaging = integrations.get("firebase_messaging")
+        messages = [self._get_mesage_body(title, body, token) for token in tokens]
+        response = messaging.send_each(messages)
+        return [
+            {
+                'token': token,
+                'success': send_response.success,
+                'message_id': send_response.message_id,
+                'error': self._get_error_code(send_response.exception),
+            } for token, send_response in zip(tokens, response.responses)
+        ]
+
+    @staticmethod
+    def _get_error_code(exception) -> str | None:
+        if exception is None:
+            return None
+        messaging = integrations.get("firebase_messaging")
+        if isinstance(exception, messaging.UnregisteredError):
+            return 'UNREGISTERED'
+        if isinstance(exception, messaging.SenderIdMismatchError):
+            return 'SENDER_ID_MISMATCH'
+        return str(getattr(exception, 'code', 'UNKNOWN')).upper()
 
     @staticmethod
     def _get_mesage_body(title: str, body: str, token: str):
+        messaging = integrations.get("firebase_messaging")
         return messaging.Message(
                 notification=messaging.Notification(title=title, body=body),
                 android=messaging.AndroidConfig(
@@ -47,3 +64,185 @@ class NotifierService:
             )
 
 
+class HttpFcmTransport:
+    # wysyła wiadomości w formacie FCM HTTP v1 pod wskazany adres,
+    # używane z lokalnym serwerem udającym FCM (FCM_ENDPOINT)
+    def __init__(self, endpoint: str, max_connections: int = 50):
+        self._url = endpoint.rstrip('/') + '/v1/projects/watchdog/messages:send'
+        self._max_connections = max_connections
+        self._client = httpx.Client(
+            timeout=10,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+
+    def send_each(self, tokens: List[str], title: str, body: str) -> List[dict]:
+        with ThreadPoolExecutor(max_workers=min(len(tokens), self._max_connections)) as executor:
+            return list(executor.map(lambda token: self._send(token, title, body), tokens))
+
+    def _send(self, token: str, title: str, body: str) -> dict:
+        try:
+            response = self._client.post(self._url, json=self._get_mesage_body(title, body, token))
+        except httpx.HTTPError:
+            return {'token': token, 'success': False, 'message_id': None, 'error': 'UNAVAILABLE'}
+
+        if response.status_code == 200:
+            return {'token': token, 'success': True, 'message_id': response.json().get('name'), 'error': None}
+        return {'token': token, 'success': False, 'message_id': None, 'error': self._get_error_code(response)}
+
+    @staticmethod
+    def _get_error_code(response: httpx.Response) -> str:
+        try:
+            error = response.json()['error']
+        except (ValueError, KeyError, TypeError):
+            return 'UNKNOWN'
+        # szczegółowy kod FCM (np. UNREGISTERED) jest w details, ogólny w status
+        for detail in error.get('details', []):
+            if detail.get('errorCode'):
+                return detail['errorCode']
+        return error.get('status', 'UNKNOWN')
+
+    @staticmethod
+    def _get_mesage_body(title: str, body: str, token: str) -> dict:
+        return {
+            'message': {
+                'token': token,
+                'notification': {'title': title, 'body': body},
+                'android': {
+                    'priority': 'high',
+                    'notification': {
+                        'channel_id': 'watchdog_alerts',
+                        'default_sound': True,
+                        'click_action': 'FLUTTER_NOTIFICATION_CLICK'
+                    }
+                }
+            }
+        }
+
+
+class NotifierMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {
+            'sent': 0,
+            'failed': 0,
+            'wasted': 0,
+            'pruned_tokens': 0,
+        }
+        self._errors = {}
+
+    def incr(self, name: str, value: int = 1):
+        with self._lock:
+            self._counters[name] += value
+
+    def record_errors(self, results: List[dict]):
+        with self._lock:
+            for result in results:
+                if result['error']:
+                    self._errors[result['error']] = self._errors.get(result['error'], 0) + 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counters, 'errors': dict(self._errors)}
+
+
+notifier_metrics = NotifierMetrics()
+_transport = None
+_prune_dead_tokens = True
+
+
+def get_transport():
+    global _transport
+    if _transport is None:
+        _transport = HttpFcmTransport(FCM_ENDPOINT) if FCM_ENDPOINT else FirebaseTransport()
+    return _transport
+
+
+def configure_notifier(transport=None, prune_dead_tokens: bool = True):
+    # podmiana transportu w całym procesie, np. na lokalny fake FCM w testach obciążeniowych
+    global _transport, _prune_dead_tokens
+    _transport = transport
+    _prune_dead_tokens = prune_dead_tokens
+
+
+class NotifierService:
+    def __init__(self, transport=None):
+        self._transport = transport or get_transport()
+
+    def send_notification(self, token: str, title: str, body: str):
+        results = self.send_multicast([token], title, body)
+        if results and results[0]['success']:
+            return results[0]['message_id']
+        return
+
+    def send_multicast(self, tokens: Iterable[str], title: str, body: str) -> List[dict]:
+        tokens = list(tokens)
+        if not tokens:
+            return []
+
+        batches = [tokens[i:i + FCM_MAX_BATCH] for i in range(0, len(tokens), FCM_MAX_BATCH)]
+        if len(batches) == 1:
+            results = self._send_batch(batches[0], title, body)
+        else:
+            with ThreadPoolExecutor(max_workers=min(len(batches), FCM_MAX_PARALLEL_BATCHES)) as executor:
+                results = [
+                    result
+                    for batch_results in executor.map(lambda batch: self._send_batch(batch, title, body), batches)
+                    for result in batch_results
+                ]
+
+        sent = sum(1 for result in results if result['success'])
+        dead_tokens = {result['token'] for result in results if result['error'] in DEAD_TOKEN_ERRORS}
+        notifier_metrics.incr('sent', sent)
+        notifier_metrics.incr('failed', len(results) - sent)
+        notifier_metrics.incr('wasted', len(dead_tokens))
+        notifier_metrics.record_errors(results)
+        print(f"Wysłano {sent}/{len(results)} powiadomień")
+        invalid = sum(1 for result in results if result['error'] == 'INVALID_ARGUMENT')
+        if invalid:
+            print(f"FCM odrzucił {invalid} powiadomień z INVALID_ARGUMENT (zły token albo treść), tokeny zostają")
+
+        if dead_tokens and _prune_dead_tokens:
+            self.prune_dead_tokens(dead_tokens)
+        return results
+
+    @staticmethod
+    def prune_dead_tokens(tokens: Iterable[str]) -> int:
+        # wywoływane już poza ścieżką requestu (dispatcher / worker), jednym UPDATE
+        tokens = list(tokens)
+        session = SessionSync()
+        try:
+            # old_notification_token jest unikalny, zwalniamy go zanim przeniesiemy token
+            session.execute(
+                update(User)
+                .where(User.old_notification_token.in_(tokens))
+                .values(old_notification_token=None)
+            )
+            result = session.execute(
+                update(User)
+                .where(User.notification_token.in_(tokens))
+                .values(old_notification_token=User.notification_token, notification_token=None)
+                .returning(User.id)
+            )
+            pruned_user_ids = result.scalars().all()
+            if pruned_user_ids:
+                session.execute(recipients_changed(pruned_user_ids))
+            session.commit()
+            notifier_metrics.incr('pruned_tokens', len(pruned_user_ids))
+            print(f"Usunięto {len(pruned_user_ids)} nieaktywnych tokenów powiadomień")
+            return len(pruned_user_ids)
+        except Exception as e:
+            session.rollback()
+            print(str(e))
+            return 0
+        finally:
+            session.close()
+
+    def _send_batch(self, tokens: List[str], title: str, body: str) -> List[dict]:
+        try:
+            return self._transport.send_each(tokens, title, body)
+        except Exception as e:
+            print(str(e))
+            return [
+                {'token': token, 'success': False, 'message_id': None, 'error': 'UNAVAILABLE'}
+                for token in tokens
+            ]
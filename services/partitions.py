@@ -0,0 +1,118 @@
+import datetime
+import re
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+
+# tabele partycjonowane miesięcznie po recorded_at (migracja b7e4d1c9a2f0)
+PARTITIONED_TABLES = ('videos', 'files_analyze')
+PARTITION_NAME = re.compile(r'_p(\d{4})_(\d{2})$')
+# partycje i odłączone archiwa, tworzone poza modelami: autogenerate alembica ma je pomijać
+PARTITION_TABLE_NAME = re.compile(
+    rf"^({'|'.join(PARTITIONED_TABLES)})_(p\d{{4}}_\d{{2}}|default|archive_(\d{{4}}_\d{{2}}|default))$"
+)
+
+
+def add_months(month: datetime.date, months: int) -> datetime.date:
+    month_index = month.year * 12 + month.month - 1 + months
+    return datetime.date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def include_partition_tables(name, type_, parent_names) -> bool:
+    # include_name dla alembic/env.py
+    if type_ == 'table':
+        return not PARTITION_TABLE_NAME.match(name)
+    return True
+
+
+class PartitionService:
+    def __init__(self, session: Session):
+        self._session = session
+
+    def ensure_future_partitions(self, table: str, months_ahead: int, today: datetime.date | None = None) -> list[str]:
+        # partycje od bieżącego miesiąca do months_ahead w przód, istniejące są pomijane
+        month = (today or datetime.date.today()).replace(day=1)
+        existing = set(self.list_partitions(table))
+        created = []
+        for _ in range(months_ahead + 1):
+            name = f'{table}_p{month:%Y_%m}'
+            if name not in existing:
+                # każdy miesiąc w savepoincie, błąd jednego nie cofa reszty transakcji (np. archiwizacji)
+                try:
+                    with self._session.begin_nested():
+                        self._create_partition(table, name, month)
+                    created.append(name)
+                except Exception as e:
+                    print(f"{name}: {str(e)}")
+            month = add_months(month, 1)
+        return created
+
+    def _create_partition(self, table: str, name: str, month: datetime.date):
+        default = f'{table}_default'
+        start, end = month.isoformat(), add_months(month, 1).isoformat()
+        # partycje zakładamy z wyprzedzeniem (PARTITION_MONTHS_AHEAD), więc partycja domyślna
+        # powinna być pusta; wiersze z tego miesiąca (np. zły zegar kamery) wymagałyby przenoszenia
+        # pod blokadą całej tabeli, zostawiamy to administratorowi
+        result = self._session.execute(
+            text(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE recorded_at >= '{start}' AND recorded_at < '{end}')")
+        )
+        if result.scalar():
+            raise RuntimeError(f"{default} zawiera wiersze z {month:%Y-%m}, partycja nie została założona")
+
+        # CREATE TABLE ... PARTITION OF bierze ACCESS EXCLUSIVE na tabeli nadrzędnej, ATTACH PARTITION
+        # tylko SHARE UPDATE EXCLUSIVE (wyłączna blokada jest na pustej partycji domyślnej),
+        # więc zapisy API i kolejka workera nie czekają na konserwację
+        self._session.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+        self._session.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM ('{start}') TO ('{end}')"))
+
+    def detach_old_partitions(self, table: str, retention_months: int, today: datetime.date | None = None) -> list[str]:
+        # odłączone partycje zostają jako zwykłe tabele <tabela>_archive_RRRR_MM,
+        # poza zasięgiem zapytań aplikacji, do zrzutu albo usunięcia przez administratora
+        oldest_kept = add_months((today or datetime.date.today()).replace(day=1), -retention_months)
+        detached = []
+        partitions = self.list_partitions(table)
+        for name, month in partitions.items():
+            if month is None or month >= oldest_kept:
+                continue
+            archive_name = f'{table}_archive_{month:%Y_%m}'
+            self._session.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+            self._session.execute(text(f"ALTER TABLE {name} RENAME TO {archive_name}"))
+            detached.append(archive_name)
+
+        if f'{table}_default' in partitions:
+            moved = self._archive_default_rows(table, oldest_kept)
+            if moved:
+                detached.append(f'{table}_archive_default ({moved})')
+        return detached
+
+    def _archive_default_rows(self, table: str, oldest_kept: datetime.date) -> int:
+        # partycja domyślna nie ma miesiąca do odłączenia, jej stare wiersze przenosimy
+        # do jednej tabeli archiwum (blokada wierszy, nie tabeli nadrzędnej)
+        archive_name = f'{table}_archive_default'
+        self._session.execute(text(f"CREATE TABLE IF NOT EXISTS {archive_name} (LIKE {table})"))
+        result = self._session.execute(
+            text(
+                f"WITH moved AS (DELETE FROM {table}_default WHERE recorded_at < :oldest_kept RETURNING *) "
+                f"INSERT INTO {archive_name} SELECT * FROM moved"
+            ),
+            {"oldest_kept": oldest_kept}
+        )
+        return result.rowcount
+
+    def list_partitions(self, table: str) -> dict[str, datetime.date | None]:
+        # nazwa partycji -> miesiąc, None dla partycji domyślnej
+        result = self._session.execute(
+            text(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+                "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                "WHERE parent.relname = :table"
+            ),
+            {"table": table}
+        )
+        partitions = {}
+        for name in result.scalars().all():
+            match = PARTITION_NAME.search(name)
+            partitions[name] = datetime.date(int(match.group(1)), int(match.group(2)), 1) if match else None
+        return partitions
@@ -0,0 +1,103 @@
+import asyncio
+import datetime
+import io
+import os
+
+from sqlalchemy import select, update
+
+from db.connector import async_session
+from models.device import Camera
+from models.video import Video
+from utils.background import BackgroundDispatcher
+from utils.env_variables import THUMBNAILS_DIR, THUMBNAIL_SOURCE_DIR, THUMBNAIL_WIDTH, \
+    THUMBNAIL_FORMAT, THUMBNAIL_WORKERS
+
+
+thumbnail_dispatcher = BackgroundDispatcher("thumbnails", concurrency=int(THUMBNAIL_WORKERS), max_queue=1000)
+
+FFMPEG_TIMEOUT = 30
+
+
+class ThumbnailService:
+    def schedule(self, video_id: int, recorded_at: datetime.datetime) -> bool:
+        return thumbnail_dispatcher.submit(self.generate, video_id, recorded_at)
+
+    async def generate(self, video_id: int, recorded_at: datetime.datetime):
+        # krótkie sesje tylko na odczyt i zapis: ffmpeg (do FFMPEG_TIMEOUT) i Pillow działają
+        # bez połączenia z puli, które inaczej wisiałoby idle in transaction
+        async with async_session() as session:
+            result = await session.execute(
+                select(Video.hash, Video.file_path, Video.thumbnial_file_path, Camera.id, Camera.device_ip)
+                .join(Camera, Video.camera_id == Camera.id)
+                # pełny klucz główny, zapytanie trafia w jedną partycję
+                .where(Video.id == video_id, Video.recorded_at == recorded_at)
+            )
+            row = result.first()
+        if not row:
+            return
+        video_hash, file_path, current_thumbnail_path, camera_id, device_ip = row
+        if current_thumbnail_path and os.path.exists(current_thumbnail_path):
+            return
+
+        frame = await self._extract_frame(self._get_source(file_path, device_ip))
+        if not frame:
+            print(f"Nie udało się pobrać klatki dla nagrania {video_hash}")
+            return
+
+        thumbnail_path = os.path.join(THUMBNAILS_DIR, f'{video_hash}.{THUMBNAIL_FORMAT}')
+        await asyncio.to_thread(self._save_thumbnail, frame, thumbnail_path)
+
+        async with async_session() as session:
+            await session.execute(
+                update(Video)
+                .where(Video.id == video_id, Video.recorded_at == recorded_at)
+                # nagranie wraca w synchronizacji przyrostowej i zmienia etag, klient dostaje thumbnail_url
+                .values(thumbnial_file_path=thumbnail_path, saved_on_server_at=Video.server_timestamp())
+            )
+            await session.commit()
+
+            from services.video import VideoService
+            await VideoService.invalidate_cache_for_camera(session, camera_id)
+
+    @staticmethod
+    def _get_source(file_path: str, device_ip: str) -> str:
+        # lokalny katalog z nagraniami zastępuje strumień z kamery (np. do testów)
+        if THUMBNAIL_SOURCE_DIR:
+            return os.path.join(THUMBNAIL_SOURCE_DIR, file_path.lstrip('/'))
+        return f'rtsp://{device_ip}:8554/vod/{file_path}'
+
+    @staticmethod
+    async def _extract_frame(source: str) -> bytes | None:
+        args = ['ffmpeg', '-loglevel', 'error']
+        if source.startswith('rtsp://'):
+            args += ['-rtsp_transport', 'tcp']
+        args += ['-ss', '1', '-i', source, '-frames:v', '1', '-f', 'image2pipe', '-vcodec', 'mjpeg', '-']
+
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=FFMPEG_TIMEOUT)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            return None
+
+        if process.returncode != 0:
+            print(stderr.decode(errors='ignore'))
+            return None
+        return stdout or None
+
+    @staticmethod
+    def _save_thumbnail(frame: bytes, thumbnail_path: str):
+        from PIL import Image
+
+        os.makedirs(os.path.dirname(thumbnail_path), exist_ok=True)
+        image = Image.open(io.BytesIO(frame))
+        image.thumbnail((int(THUMBNAIL_WIDTH), int(THUMBNAIL_WIDTH)))
+
+        tmp_path = thumbnail_path + '.tmp'
+        image.convert('RGB').save(tmp_path, format=THUMBNAIL_FORMAT.upper(), quality=75)
+        os.replace(tmp_path, thumbnail_path)
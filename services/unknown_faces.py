@@ -0,0 +1,44 @@
+import time
+
+import numpy as np
+
+
+class RecentUnknownFaces:
+    # kamera -> ostatnio widziane nierozpoznane twarze (kodowanie, id pierwszej detekcji);
+    # ta sama obca osoba przez kilka minut to jedno zdarzenie, a nie alarm na każdą klatkę.
+    # Stan we wspólnym słowniku Managera, wpisy wygasają po ttl od ostatniego dopasowania,
+    # ale najpóźniej po max_duration od pierwszej detekcji: obca osoba kręcąca się
+    # dłużej wywołuje kolejny alarm
+    def __init__(self, state, lock, ttl: float, tolerance: float, max_duration: float, max_per_camera: int = 50):
+        self._state = state
+        self._lock = lock
+        self._ttl = ttl
+        self._tolerance = tolerance
+        self._max_duration = max_duration
+        self._max_per_camera = max_per_camera
+
+    def match(self, camera_id: int, encoding: np.ndarray, now: float | None = None) -> int | None:
+        # id zadania z pierwszą detekcją tej osoby albo None
+        now = time.time() if now is None else now
+        with self._lock:
+            entries = [
+                entry for entry in self._state.get(camera_id, [])
+                if now - entry['seen_at'] <= self._ttl and now - entry['first_seen_at'] <= self._max_duration
+            ]
+            match = None
+            if entries:
+                distances = np.linalg.norm(np.array([entry['encoding'] for entry in entries]) - encoding, axis=1)
+                best_index = int(distances.argmin())
+                if distances[best_index] <= self._tolerance:
+                    match = entries[best_index]
+                    match['seen_at'] = now
+            self._state[camera_id] = entries
+            return match['first_task_id'] if match else None
+
+    def add(self, camera_id: int, encoding: np.ndarray, first_task_id: int, now: float | None = None):
+        now = time.time() if now is None else now
+        with self._lock:
+            entries = self._state.get(camera_id, [])
+            entries.append({'encoding': encoding, 'first_task_id': first_task_id, 'first_seen_at': now, 'seen_at': now})
+            # proxy Managera nie widzi zmian w zagnieżdżonej liście, trzeba przypisać ponownie
+            self._state[camera_id] = entries[-self._max_per_camera:]
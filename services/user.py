@@ -11,6 +11,8 @@ from sqlalchemy.orm import selectinload
 
 from models.analyze import FacesFromUser
 from models.user import User, UserNotifications, Group, UserGroupConnector
+from models.visibility import UserPeer
+from services.notification_recipients import recipients_changed
 from schemas.user import UserCreate, UserToken, UserNotificationToken, UserNotificationSettings
 from utils.auth import AuthBackend
 from utils.env_variables import UPLOAD_DIR_KNOWN
@@ -38,7 +40,7 @@ class UserService:
         new_user = User(**user_schema.dict())
         await new_user.generate_token(self.session)
         
-        hashed_password = AuthBackend().get_password_hash(user_schema.password)
+        hashed_password = await AuthBackend().get_password_hash_async(user_schema.password)
         new_user.password = hashed_password
         new_user.activated_at = datetime.datetime.now()
 
@@ -99,7 +101,7 @@ class UserService:
             raise_exception = True
 
         if not raise_exception:
-            password_valid = AuthBackend().verify_password(password, existing_user.password)
+            password_valid = await AuthBackend().verify_password_async(password, existing_user.password)
             if not password_valid:
                 raise_exception = True
 
@@ -134,6 +136,7 @@ class UserService:
         update_data = updated_notifications.model_dump(exclude_unset=True)
         for field, value in update_data.items():
             setattr(notifications, field, value)
+        await self.session.execute(recipients_changed([current_user.id]))
         
         await self.session.commit()
         await self.session.refresh(notifications)
@@ -141,16 +144,7 @@ class UserService:
         return notifications
 
     async def get_verified_users(self, current_user: User):
-        users_in_same_groups = (
-            select(UserGroupConnector.user_id)
-            .where(
-                UserGroupConnector.group_id.in_(
-                    select(UserGroupConnector.group_id)
-                    .where(UserGroupConnector.user_id == current_user.id)
-                )
-            )
-            .distinct()
-        )
+        users_in_same_groups = self._peer_user_ids(current_user)
 
         stmt = (
             select(
@@ -320,13 +314,7 @@ class UserService:
             .where(
                 FacesFromUser.name_hash == name_hash,
                 FacesFromUser.user_id.in_(
-                    select(UserGroupConnector.user_id).where(
-                        UserGroupConnector.group_id.in_(
-                            select(UserGroupConnector.group_id).where(
-                                UserGroupConnector.user_id == current_user.id
-                            )
-                        )
-                    )
+                    self._peer_user_ids(current_user)
                 )
             )
             .values(name=new_name)
@@ -343,15 +331,7 @@ class UserService:
         await self.session.commit()
 
     async def __get_verified_user_photo_by_ucer_hash(self, current_user, hash):
-        users_in_same_groups = (
-            select(UserGroupConnector.user_id)
-            .where(
-                UserGroupConnector.group_id.in_(
-                    select(UserGroupConnector.group_id)
-                    .where(UserGroupConnector.user_id == current_user.id)
-                )
-            )
-        )
+        users_in_same_groups = self._peer_user_ids(current_user)
 
         query = select(FacesFromUser).where(
             FacesFromUser.hash == hash,
@@ -377,13 +357,7 @@ class UserService:
             .where(
                 FacesFromUser.hash == photo_hash,
                 FacesFromUser.user_id.in_(
-                    select(UserGroupConnector.user_id).where(
-                        UserGroupConnector.group_id.in_(
-                            select(UserGroupConnector.group_id).where(
-                                UserGroupConnector.user_id == current_user.id
-                            )
-                        )
-                    )
+                    self._peer_user_ids(current_user)
                 )
             )
             .limit(1)
@@ -406,13 +380,7 @@ class UserService:
             .where(
                 FacesFromUser.name_hash == name_hash,
                 FacesFromUser.user_id.in_(
-                    select(UserGroupConnector.user_id).where(
-                        UserGroupConnector.group_id.in_(
-                            select(UserGroupConnector.group_id).where(
-                                UserGroupConnector.user_id == current_user.id
-                            )
-                        )
-                    )
+                    self._peer_user_ids(current_user)
                 )
             )
         )
@@ -425,11 +393,7 @@ class UserService:
         query = select(func.count(FacesFromUser.id)).where(
             FacesFromUser.name_hash == name_hash,
             FacesFromUser.user_id.in_(
-                select(UserGroupConnector.user_id)
-                .where(UserGroupConnector.group_id.in_(
-                    select(UserGroupConnector.group_id)
-                    .where(UserGroupConnector.user_id == current_user.id)
-                ))
+                self._peer_user_ids(current_user)
             )
         )
         result = await self.session.execute(query)
@@ -439,11 +403,7 @@ class UserService:
         query = select(FacesFromUser).where(
             FacesFromUser.name_hash == name_hash,
             FacesFromUser.user_id.in_(
-                select(UserGroupConnector.user_id)
-                .where(UserGroupConnector.group_id.in_(
-                    select(UserGroupConnector.group_id)
-                    .where(UserGroupConnector.user_id == current_user.id)
-                ))
+                self._peer_user_ids(current_user)
             )
         )
         
@@ -524,6 +484,11 @@ class UserService:
         
         return groups_data
 
+    @staticmethod
+    def _peer_user_ids(current_user: User):
+        # użytkownicy z tych samych grup, z zmaterializowanej tabeli user_peers
+        return select(UserPeer.peer_user_id).where(UserPeer.user_id == current_user.id)
+
     @staticmethod
     def save_photo_to_files(current_user, file, created_at=datetime.datetime.now()):
         file_path = os.path.join(UPLOAD_DIR_KNOWN, current_user.username, )
@@ -1,15 +1,27 @@
+import asyncio
+import base64
+import binascii
 import datetime
+import hashlib
+import os
 from dateutil import parser
 
+from fastapi import HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
-from sqlalchemy.orm import selectinload, joinedload
+from sqlalchemy import select, tuple_, func, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import aliased
 
-from models.user import User
-from models.device import Camera, CameraGroupConnector
-from models.user import User, Group, UserGroupConnector, UserNotifications
+from models.device import Camera
+from models.user import User, UserNotifications
 from models.video import Video
-from services.notifier import NotifierService
+from models.visibility import UserCameraVisibility
+from db.connector import async_session
+from services.notifier import NotifierService, notification_dispatcher
+from services.thumbnail import ThumbnailService
+from constants.models.video import VIDEO_TYPES
+from utils.cache import cache
+from utils.env_variables import VIDEOS_CACHE_TTL, VIDEOS_SYNC_OVERLAP, VIDEOS_LIST_DAYS
 
 
 class VideoService:
@@ -17,47 +29,42 @@ class VideoService:
         self._session = session
         self._user = current_user
         self._camera = current_camera
+        self._cameras = None
+        self._cache_generation = None
+        self._etags = {}
 
-    async def get_videos_for_user(self):
-        stmt_cameras = (
-            select(Camera)
-            .join(CameraGroupConnector, Camera.id == CameraGroupConnector.camera_id)
-            .join(Group, CameraGroupConnector.group_id == Group.id)
-            .join(UserGroupConnector, Group.id == UserGroupConnector.group_id)
-            .join(User, UserGroupConnector.user_id == User.id)
-            .filter(User.id == self._user.id)
-        )
-        result = await self._session.execute(stmt_cameras)
-        cameras = result.scalars().all()
+    async def get_videos_for_user(self, since: datetime.datetime | None = None):
+        cached = await cache.get(await self._videos_cache_key(since))
+        if cached is not None:
+            return cached['result']
+
+        # etag liczony przed listą, w najgorszym razie klient dostanie starszy etag
+        etag = await self.get_videos_etag(since)
+        cameras = await self._get_cameras_for_user()
+        cameras_by_id = {camera.id: camera for camera in cameras}
 
         stmt_videos = (
             select(Video)
-            .filter(Video.camera_id.in_([camera.id for camera in cameras]))
-            .options(selectinload(Video.camera))
+            .filter(Video.camera_id.in_(cameras_by_id.keys()), self._recent_videos())
             .order_by(Video.recorded_at.desc())
         )
+        if since:
+            stmt_videos = stmt_videos.filter(Video.saved_on_server_at > self._sync_from(since))
 
         result = await self._session.execute(stmt_videos)
         videos_for_user = result.scalars().all()
+
+        watermark = max(
+            (video.saved_on_server_at for video in videos_for_user if video.saved_on_server_at),
+            default=since
+        )
         result = {
-            'configured_devices': [
-                {
-                    'device_ip': camera.device_ip,
-                    'device_name': camera.device_name
-                # } for camera in [cameras[0]]],
-                } for camera in cameras],
+            'configured_devices': self._serialize_devices(cameras),
             'videos': [
-                {
-                    'url': f'rtsp://{video.camera.device_ip}:8554/vod/{video.file_path}',
-                    'hash': video.hash,
-                    'camera': video.camera.device_name,
-                    'type': video.type_display,
-                    # 'importance_level': video.importance_level,
-                    'importance_level': 1,
-                    'recorded_at': video.recorded_at.isoformat(),
-                    'record_length': f'{video.record_length.total_seconds()}'
-                } for video in videos_for_user
-            ]
+                self._serialize_video(video, cameras_by_id[video.camera_id])
+                for video in videos_for_user
+            ],
+            'watermark': watermark.replace(tzinfo=datetime.timezone.utc).isoformat() if watermark else None
         }
 
         # result = {
@@ -65,44 +72,361 @@ class VideoService:
             # 'videos': []
         # }
 
+        await cache.set(
+            await self._videos_cache_key(since),
+            {'etag': etag, 'result': result},
+            ttl=int(VIDEOS_CACHE_TTL)
+        )
         return result
 
+    async def get_videos_page_for_user(self, cursor: str | None = None, limit: int = 50, camera: str | None = None, video_type: str | None = None):
+        cameras = await self._get_cameras_for_user()
+        if camera:
+            cameras = [c for c in cameras if c.device_name == camera]
+        cameras_by_id = {c.id: c for c in cameras}
+
+        if not cameras_by_id:
+            return {'videos': [], 'next_cursor': None}
+
+        # keyset po (recorded_at, id), koszt strony nie zależy od długości historii;
+        # indeks (camera_id, recorded_at, id) daje kolejność tylko dla jednej kamery,
+        # więc każda kamera ma własny podzapyt z limitem, a wyniki są łączone na końcu
+        filters = []
+        if video_type:
+            filters.append(Video.type == self._resolve_video_type(video_type))
+        if cursor:
+            recorded_at, video_id = self._decode_cursor(cursor)
+            filters.append(tuple_(Video.recorded_at, Video.id) < tuple_(recorded_at, video_id))
+
+        per_camera = [
+            select(Video)
+            .filter(Video.camera_id == camera_id, *filters)
+            .order_by(Video.recorded_at.desc(), Video.id.desc())
+            .limit(limit + 1)
+            for camera_id in cameras_by_id
+        ]
+        if len(per_camera) == 1:
+            stmt_videos = per_camera[0]
+        else:
+            page = aliased(Video, union_all(*per_camera).subquery())
+            stmt_videos = (
+                select(page)
+                .order_by(page.recorded_at.desc(), page.id.desc())
+                .limit(limit + 1)
+            )
+
+        result = await self._session.execute(stmt_videos)
+        videos = result.scalars().all()
+
+        next_cursor = None
+        if len(videos) > limit:
+            videos = videos[:limit]
+            next_cursor = self._encode_cursor(videos[-1])
+
+        return {
+            'videos': [
+                self._serialize_video(video, cameras_by_id[video.camera_id])
+                for video in videos
+            ],
+            'next_cursor': next_cursor
+        }
+
+    async def get_videos_etag(self, since: datetime.datetime | None = None) -> str:
+        # tani agregat zamiast pełnej listy, jeśli nic się nie zmieniło zwracamy 304
+        if since in self._etags:
+            return self._etags[since]
+
+        cached = await cache.get(await self._videos_cache_key(since))
+        if cached is not None:
+            self._etags[since] = cached['etag']
+            return cached['etag']
+
+        cameras = await self._get_cameras_for_user()
+        camera_ids = [camera.id for camera in cameras]
+
+        stmt = select(
+            func.count(Video.id),
+            func.max(Video.saved_on_server_at),
+            func.max(Video.id)
+        ).filter(Video.camera_id.in_(camera_ids), self._recent_videos())
+        if since:
+            stmt = stmt.filter(Video.saved_on_server_at > self._sync_from(since))
+
+        result = await self._session.execute(stmt)
+        count, last_saved_at, last_id = result.one()
+
+        devices = sorted((camera.id, camera.device_name or '', camera.device_ip or '') for camera in cameras)
+        state = f'{since}|{devices}|{count}|{last_saved_at}|{last_id}'
+        # słaby etag: GZipMiddleware zwraca pod nim zarówno treść skompresowaną, jak i nie
+        self._etags[since] = 'W/"' + hashlib.sha256(state.encode()).hexdigest()[:32] + '"'
+        return self._etags[since]
+
+    @staticmethod
+    def _recent_videos():
+        # lista, delta i etag liczone po tym samym zakresie; dolna granica klucza
+        # partycjonowania pozwala planerowi pominąć starsze partycje
+        return Video.recorded_at >= datetime.datetime.now() - datetime.timedelta(days=int(VIDEOS_LIST_DAYS))
+
+    async def _get_cameras_for_user(self) -> list[Camera]:
+        if self._cameras is not None:
+            return self._cameras
+
+        cameras_key = await self._cameras_cache_key()
+        cached = await cache.get(cameras_key)
+        if cached is not None:
+            self._cameras = [Camera(**camera) for camera in cached]
+            return self._cameras
+
+        stmt_cameras = (
+            select(Camera)
+            .join(UserCameraVisibility, UserCameraVisibility.camera_id == Camera.id)
+            .filter(UserCameraVisibility.user_id == self._user.id)
+        )
+        result = await self._session.execute(stmt_cameras)
+        self._cameras = result.scalars().all()
+
+        await cache.set(
+            cameras_key,
+            [
+                {
+                    'id': camera.id,
+                    'device_name': camera.device_name,
+                    'device_ip': camera.device_ip
+                } for camera in self._cameras
+            ],
+            ttl=int(VIDEOS_CACHE_TTL)
+        )
+        return self._cameras
+
+    async def _get_cache_generation(self) -> int:
+        # zmiana generacji unieważnia wszystkie wpisy użytkownika naraz
+        if self._cache_generation is None:
+            self._cache_generation = await cache.get_counter(f'videos_gen:{self._user.id}')
+        return self._cache_generation
+
+    async def _cameras_cache_key(self) -> str:
+        return f'cameras:{self._user.id}:{await self._get_cache_generation()}'
+
+    async def _videos_cache_key(self, since: datetime.datetime | None) -> str:
+        since_key = since.isoformat() if since else ''
+        return f'videos:{self._user.id}:{await self._get_cache_generation()}:{since_key}'
+
+    @staticmethod
+    async def invalidate_cache_for_users(user_ids):
+        for user_id in user_ids:
+            await cache.incr(f'videos_gen:{user_id}')
+
+    @classmethod
+    async def invalidate_cache_for_camera(cls, session: AsyncSession, camera_id: int):
+        stmt = (
+            select(UserCameraVisibility.user_id)
+            .where(UserCameraVisibility.camera_id == camera_id)
+        )
+        result = await session.execute(stmt)
+        await cls.invalidate_cache_for_users(result.scalars().all())
+
+    @staticmethod
+    def _serialize_devices(cameras) -> list[dict]:
+        return [
+            {
+                'device_ip': camera.device_ip,
+                'device_name': camera.device_name
+            # } for camera in [cameras[0]]],
+            } for camera in cameras
+        ]
+
+    @staticmethod
+    def _serialize_video(video: Video, camera: Camera) -> dict:
+        return {
+            'url': f'rtsp://{camera.device_ip}:8554/vod/{video.file_path}',
+            'hash': video.hash,
+            'camera': camera.device_name,
+            'type': video.type_display,
+            # 'importance_level': video.importance_level,
+            'importance_level': 1,
+            'recorded_at': video.recorded_at.isoformat(),
+            'record_length': f'{video.record_length.total_seconds()}',
+            'thumbnail_url': f'/videos/thumbnail/{video.hash}' if video.thumbnial_file_path else None
+        }
+
+    async def get_thumbnail_path(self, video_hash: str) -> str:
+        cameras = await self._get_cameras_for_user()
+        result = await self._session.execute(
+            select(Video.thumbnial_file_path)
+            .where(
+                Video.hash == video_hash,
+                Video.camera_id.in_([camera.id for camera in cameras])
+            )
+            # hash jest unikalny tylko razem z recorded_at (klucz partycjonowania)
+            .limit(1)
+        )
+        thumbnail_path = result.scalar_one_or_none()
+
+        if not thumbnail_path or not os.path.exists(thumbnail_path):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Miniatura nie istnieje"
+            )
+        return thumbnail_path
+
+    @staticmethod
+    def _sync_from(since: datetime.datetime) -> datetime.datetime:
+        # saved_on_server_at to czas wstawienia, nie commitu; transakcja zatwierdzona
+        # po wydaniu watermarka może mieć wcześniejszy czas, dlatego okno zakładki
+        # (nagrania z zakładki klient dostaje ponownie, rozpoznaje je po hashu)
+        return since - datetime.timedelta(seconds=int(VIDEOS_SYNC_OVERLAP))
+
+    @staticmethod
+    def parse_watermark(since: str | None) -> datetime.datetime | None:
+        if not since:
+            return None
+        try:
+            since_at = parser.isoparse(since)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Niepoprawny znacznik czasu"
+            )
+        # saved_on_server_at jest w UTC bez strefy; znacznik bez strefy to nasz watermark (też UTC)
+        if since_at.tzinfo:
+            since_at = since_at.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return since_at
+
+    @staticmethod
+    def _resolve_video_type(video_type: str) -> str:
+        for code, display in VIDEO_TYPES:
+            if video_type in (code, display):
+                return code
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Nieznany typ nagrania"
+        )
+
+    @staticmethod
+    def _encode_cursor(video: Video) -> str:
+        raw = f'{video.recorded_at.isoformat()}|{video.id}'
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> tuple[datetime.datetime, int]:
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+            recorded_at, video_id = raw.rsplit('|', 1)
+            return datetime.datetime.fromisoformat(recorded_at), int(video_id)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Niepoprawny kursor"
+            )
+
     async def save_info_about_video(self, video_schema):
+        # ta sama ścieżka co zbiorczy zapis, ponowienie tego samego klipu dowolnym
+        # endpointem trafia na ten sam klucz idempotencji i nie tworzy duplikatu
         try:
-            video_schema = video_schema.dict()
-            video_schema['record_length'] = datetime.timedelta(seconds=int(video_schema["record_length"]))
-            video_schema['camera_id'] = self._camera.id
-            video_schema['recorded_at'] = parser.isoparse(video_schema['recorded_at'])
-            new_video = Video(**video_schema)
-            await new_video.generate_hash(self._session)
-            
-            new_video.saved_on_server_at = datetime.datetime.now()
-            
-            self._session.add(new_video)
-            await self._session.commit()
-            await self.trigger_notification_new_video()
+            await self.save_info_about_videos([video_schema])
             return True
         except Exception as e:
             print(e)
             return False
 
-    async def trigger_notification_new_video(self):
+    async def save_info_about_videos(self, videos_schemas) -> dict:
+        saved_on_server_at = Video.server_timestamp()
+        pending = {}
+        for video_schema in videos_schemas:
+            video_data = self._prepare_video_data(video_schema.dict())
+            video_data['idempotency_key'] = video_data.get('idempotency_key') or video_data['file_path']
+            video_data['saved_on_server_at'] = saved_on_server_at
+            pending[video_data['idempotency_key']] = video_data
+
+        # zamiast SELECT na każdy hash polegamy na unikalności w bazie, wiersze odrzucone
+        # przez kolizję hasha dostają nowy hash i idą jeszcze raz; ograniczenie to (hash, recorded_at),
+        # więc wyłapuje tylko kolizje w obrębie tego samego recorded_at, globalnie chroni losowość uuid4
+        inserted_keys = []
+        for _ in range(3):
+            for video_data in pending.values():
+                video_data['hash'] = Video.new_hash()
+
+            stmt = (
+                pg_insert(Video)
+                .values(list(pending.values()))
+                .on_conflict_do_nothing()
+                .returning(Video.id, Video.recorded_at, Video.idempotency_key)
+            )
+            result = await self._session.execute(stmt)
+            for video_id, recorded_at, idempotency_key in result.all():
+                inserted_keys.append((video_id, recorded_at))
+                pending.pop(idempotency_key)
+
+            if not pending:
+                break
+
+            # unikalność klucza idempotencji obejmuje recorded_at, lista recorded_at zawęża partycje
+            result = await self._session.execute(
+                select(Video.idempotency_key).where(
+                    Video.camera_id == self._camera.id,
+                    Video.recorded_at.in_({video_data['recorded_at'] for video_data in pending.values()}),
+                    tuple_(Video.idempotency_key, Video.recorded_at).in_(
+                        [(key, video_data['recorded_at']) for key, video_data in pending.items()]
+                    )
+                )
+            )
+            for idempotency_key in result.scalars().all():
+                pending.pop(idempotency_key)
+
+            if not pending:
+                break
+        else:
+            await self._session.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Nie udało się zapisać nagrań"
+            )
+
+        await self._session.commit()
+
+        if inserted_keys:
+            await self.invalidate_cache_for_camera(self._session, self._camera.id)
+            thumbnail_service = ThumbnailService()
+            for video_id, recorded_at in inserted_keys:
+                thumbnail_service.schedule(video_id, recorded_at)
+
+            # jedno zbiorcze powiadomienie zamiast osobnego na każde nagranie
+            body = "Nowe nagranie" if len(inserted_keys) == 1 else f"Nowe nagrania: {len(inserted_keys)}"
+            notification_dispatcher.submit(self.trigger_notification_new_video, self._camera.id, body)
+
+        return {
+            'inserted': len(inserted_keys),
+            'duplicates': len(videos_schemas) - len(inserted_keys)
+        }
+
+    def _prepare_video_data(self, video_data: dict) -> dict:
+        video_data['record_length'] = datetime.timedelta(seconds=int(video_data["record_length"]))
+        video_data['camera_id'] = self._camera.id
+        video_data['recorded_at'] = parser.isoparse(video_data['recorded_at'])
+        return video_data
+
+    @staticmethod
+    async def trigger_notification_new_video(camera_id: int, body: str = "Nowe nagranie"):
         stmt_cameras = (
             select(User, UserNotifications)
-            .join(UserGroupConnector, User.id == UserGroupConnector.user_id)
-            .join(Group, UserGroupConnector.group_id == Group.id)
-            .join(CameraGroupConnector, Group.id == CameraGroupConnector.group_id)
-            .join(Camera, CameraGroupConnector.camera_id == Camera.id)
+            .join(UserCameraVisibility, UserCameraVisibility.user_id == User.id)
             .outerjoin(UserNotifications, UserNotifications.user_id == User.id)
-            .where(Camera.id == self._camera.id)
-            .distinct()
+            .where(UserCameraVisibility.camera_id == camera_id)
         )
-        
-        result = await self._session.execute(stmt_cameras)
-        users_with_notifications = result.all()
-        
+
+        async with async_session() as session:
+            result = await session.execute(stmt_cameras)
+            users_with_notifications = result.all()
+
+        notification_tokens = set()
         for user, user_not_stngs in users_with_notifications:
             user_notification_token = user.notification_token
             if user_notification_token:
                 if user_not_stngs and user_not_stngs.notification_new_video:
-                    NotifierService().send_notification(user_notification_token, "Powiadomienie o detekcji", "Nowe nagranie")
+                    notification_tokens.add(user_notification_token)
+
+        if notification_tokens:
+            # firebase_admin jest synchroniczny, nie blokujemy pętli zdarzeń
+            await asyncio.to_thread(
+                NotifierService().send_multicast, notification_tokens, "Powiadomienie o detekcji", body
+            )
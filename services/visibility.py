@@ -0,0 +1,72 @@
+from typing import Iterable
+
+from sqlalchemy import select, delete, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from models.device import CameraGroupConnector
+from models.user import UserGroupConnector
+from models.visibility import UserCameraVisibility, UserPeer
+from services.notification_recipients import recipients_changed
+
+
+class VisibilityService:
+    def __init__(self, session: AsyncSession):
+        self._session = session
+
+    async def refresh_for_users(self, user_ids: Iterable[int]) -> set[int]:
+        # przelicza widoczność dla podanych użytkowników i wszystkich z ich grup
+        # (zmiana członkostwa zmienia też listę "sąsiadów" pozostałych członków),
+        # zwraca id użytkowników których dotyczyła zmiana
+        user_ids = set(user_ids)
+        if not user_ids:
+            return set()
+
+        groups_of_users = select(UserGroupConnector.group_id).where(UserGroupConnector.user_id.in_(user_ids))
+        result = await self._session.execute(
+            select(UserGroupConnector.user_id)
+            .where(UserGroupConnector.group_id.in_(groups_of_users))
+            .distinct()
+        )
+        affected_user_ids = set(result.scalars().all()) | user_ids
+
+        await self._session.execute(
+            delete(UserCameraVisibility).where(UserCameraVisibility.user_id.in_(affected_user_ids))
+        )
+        await self._session.execute(
+            delete(UserPeer).where(UserPeer.user_id.in_(affected_user_ids))
+        )
+        await self._session.execute(self._insert_cameras(affected_user_ids))
+        await self._session.execute(self._insert_peers(affected_user_ids))
+        await self._session.execute(recipients_changed(affected_user_ids))
+        return affected_user_ids
+
+    async def rebuild_all(self):
+        await self._session.execute(delete(UserCameraVisibility))
+        await self._session.execute(delete(UserPeer))
+        await self._session.execute(self._insert_cameras())
+        await self._session.execute(self._insert_peers())
+        await self._session.execute(recipients_changed())
+
+    @staticmethod
+    def _insert_cameras(user_ids: set[int] | None = None):
+        stmt = (
+            select(UserGroupConnector.user_id, CameraGroupConnector.camera_id)
+            .join(CameraGroupConnector, CameraGroupConnector.group_id == UserGroupConnector.group_id)
+            .distinct()
+        )
+        if user_ids is not None:
+            stmt = stmt.where(UserGroupConnector.user_id.in_(user_ids))
+        return insert(UserCameraVisibility).from_select(['user_id', 'camera_id'], stmt)
+
+    @staticmethod
+    def _insert_peers(user_ids: set[int] | None = None):
+        peer = aliased(UserGroupConnector)
+        stmt = (
+            select(UserGroupConnector.user_id, peer.user_id)
+            .join(peer, peer.group_id == UserGroupConnector.group_id)
+            .distinct()
+        )
+        if user_ids is not None:
+            stmt = stmt.where(UserGroupConnector.user_id.in_(user_ids))
+        return insert(UserPeer).from_select(['user_id', 'peer_user_id'], stmt)
@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+# moduły czytają konfigurację przy imporcie, bez pliku .env potrzebne są wartości domyślne
+os.environ.setdefault('UPLOAD_DIR', '/tmp/watchdog_storages')
+os.environ.setdefault('UPLOAD_DIR_UNKNOWN', '/to_analyze')
+os.environ.setdefault('UPLOAD_DIR_KNOWN', '/known_users')
+for key, value in {'DB_USER': 'watchdog', 'DB_PASSWORD': 'watchdog', 'DB_NAME': 'watchdog',
+                   'DB_URL': 'localhost', 'DB_PORT': '5432'}.items():
+    os.environ.setdefault(key, value)
+
+from benchmarks.import_time_budget import FORBIDDEN_MODULES, TARGETS, profile_import
+
+# ten sam budżet co domyślny w benchmarks/import_time_budget.py, na wolniejszej maszynie do nadpisania
+IMPORT_BUDGET_MS = float(os.getenv('IMPORT_BUDGET_MS', 1500))
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize("target", TARGETS)
+def test_import_time_budget(target, monkeypatch):
+    # import w osobnym procesie (python -X importtime), z katalogu repozytorium
+    monkeypatch.chdir(REPO_DIR)
+    cumulative = profile_import(target)
+
+    heavy = sorted(name for name in cumulative if name.startswith(FORBIDDEN_MODULES))
+    assert not heavy, f"ciężkie moduły ładowane przy imporcie {target}: {', '.join(heavy[:5])}"
+
+    total_ms = cumulative.get(target, 0) / 1000
+    assert total_ms <= IMPORT_BUDGET_MS, f"import {target}: {total_ms:.0f} ms, budżet {IMPORT_BUDGET_MS:.0f} ms"
@@ -0,0 +1,25 @@
+import importlib
+import os
+
+import pytest
+
+# moduły czytają konfigurację przy imporcie, bez pliku .env potrzebne są wartości domyślne
+os.environ.setdefault('UPLOAD_DIR', '/tmp/watchdog_storages')
+os.environ.setdefault('UPLOAD_DIR_UNKNOWN', '/to_analyze')
+os.environ.setdefault('UPLOAD_DIR_KNOWN', '/known_users')
+for key, value in {'DB_USER': 'watchdog', 'DB_PASSWORD': 'watchdog', 'DB_NAME': 'watchdog',
+                   'DB_URL': 'localhost', 'DB_PORT': '5432'}.items():
+    os.environ.setdefault(key, value)
+
+
+@pytest.mark.parametrize("module", [
+    "services.notification_recipients",
+    "services.user",
+    "services.notifier",
+    "services.visibility",
+    "utils.auth",
+    "workers.face_detector",
+    "main",
+])
+def test_module_imports(module):
+    importlib.import_module(module)
@@ -0,0 +1,50 @@
+import os
+
+import pytest
+
+os.environ.setdefault('UPLOAD_DIR', '/tmp/watchdog_storages')
+os.environ.setdefault('UPLOAD_DIR_UNKNOWN', '/to_analyze')
+os.environ.setdefault('UPLOAD_DIR_KNOWN', '/known_users')
+
+from fastapi.testclient import TestClient
+
+from routers import metrics
+
+
+@pytest.fixture
+def client():
+    # sam router, bez startu aplikacji (migracje, połączenie z bazą)
+    from fastapi import FastAPI
+    app = FastAPI()
+    app.include_router(metrics.router)
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("path", ["/metrics", "/metrics/profile?seconds=0.1"])
+def test_disabled_without_configured_token(client, monkeypatch, path):
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", None)
+    assert client.get(path).status_code == 403
+    assert client.get(path, headers={"X-Metrics-Token": ""}).status_code == 403
+
+
+@pytest.mark.parametrize("path", ["/metrics", "/metrics/profile?seconds=0.1"])
+def test_wrong_token_rejected(client, monkeypatch, path):
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "secret")
+    assert client.get(path).status_code == 403
+    assert client.get(path, headers={"X-Metrics-Token": "wrong"}).status_code == 403
+
+
+def test_metrics_with_token(client, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "secret")
+    response = client.get("/metrics", headers={"X-Metrics-Token": "secret"})
+    assert response.status_code == 200
+    assert "routes" in response.json()
+
+
+def test_profile_with_token(client, monkeypatch, tmp_path):
+    from utils import profiler
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "secret")
+    monkeypatch.setattr(profiler, "PROFILES_DIR", str(tmp_path))
+    response = client.get("/metrics/profile?seconds=0.2", headers={"X-Metrics-Token": "secret"})
+    assert response.status_code == 200
+    assert response.headers["X-Profile-Path"].startswith(str(tmp_path))
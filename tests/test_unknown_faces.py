@@ -0,0 +1,29 @@
+import threading
+
+import numpy as np
+
+from services.unknown_faces import RecentUnknownFaces
+
+
+def _faces():
+    return RecentUnknownFaces({}, threading.Lock(), ttl=300, tolerance=0.5, max_duration=900)
+
+
+def test_same_face_within_ttl_is_one_event():
+    faces = _faces()
+    encoding = np.zeros(128)
+    faces.add(1, encoding, first_task_id=10, now=0)
+
+    assert faces.match(1, encoding + 0.01, now=200) == 10
+    assert faces.match(2, encoding, now=200) is None
+
+
+def test_event_ends_after_max_duration_even_when_face_keeps_matching():
+    faces = _faces()
+    encoding = np.zeros(128)
+    faces.add(1, encoding, first_task_id=10, now=0)
+
+    # każde dopasowanie przesuwa ttl, ale nie wydłuża zdarzenia poza max_duration
+    for now in range(200, 900, 200):
+        assert faces.match(1, encoding, now=now) == 10
+    assert faces.match(1, encoding, now=1000) is None
@@ -0,0 +1,31 @@
+import datetime
+import os
+
+os.environ.setdefault('UPLOAD_DIR', '/tmp/watchdog_storages')
+os.environ.setdefault('UPLOAD_DIR_UNKNOWN', '/to_analyze')
+os.environ.setdefault('UPLOAD_DIR_KNOWN', '/known_users')
+for key, value in {'DB_USER': 'watchdog', 'DB_PASSWORD': 'watchdog', 'DB_NAME': 'watchdog',
+                   'DB_URL': 'localhost', 'DB_PORT': '5432'}.items():
+    os.environ.setdefault(key, value)
+
+import main  # noqa: F401, rejestracja mapperów
+from routers.video import etag_matches
+from services.video import VideoService
+
+
+def test_etag_matches_weak_and_strong_forms():
+    etag = 'W/"abc"'
+    assert etag_matches('W/"abc"', etag)
+    # pośrednik mógł zwrócić klientowi tag bez W/
+    assert etag_matches('"abc"', etag)
+    assert etag_matches('"other", W/"abc"', etag)
+    assert etag_matches('*', etag)
+    assert not etag_matches('W/"other"', etag)
+    assert not etag_matches(None, etag)
+
+
+def test_watermark_is_normalised_to_utc():
+    assert VideoService.parse_watermark('2026-10-19T14:00:00+02:00') == datetime.datetime(2026, 10, 19, 12, 0)
+    assert VideoService.parse_watermark('2026-10-19T12:00:00Z') == datetime.datetime(2026, 10, 19, 12, 0)
+    # watermark bez strefy to UTC wydany przez serwer
+    assert VideoService.parse_watermark('2026-10-19T12:00:00') == datetime.datetime(2026, 10, 19, 12, 0)
@@ -5,16 +5,16 @@ from sqlalchemy import update
 from fastapi import Depends, HTTPException, status, Header
 from fastapi.security import OAuth2PasswordBearer
 from typing import Union, Any
-from passlib.context import CryptContext
 
 from db.connector import get_session
 from utils.env_variables import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_MINUTES
 from models.user import User
 from models.device import Camera
+from services.notification_recipients import recipients_changed
 from schemas.user import UserDataFromToken, UserNotificationToken
+from utils.password_hasher import pwd_context, password_hasher
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(
     tokenUrl="/users/new-token"
 )
@@ -27,6 +27,12 @@ class AuthBackend:
     def get_password_hash(self, password):
         return pwd_context.hash(password)
 
+    async def verify_password_async(self, plain_password, hashed_password):
+        return await password_hasher.verify(plain_password, hashed_password)
+
+    async def get_password_hash_async(self, password):
+        return await password_hasher.hash(password)
+
     # def authenticate_user(self, fake_db, username: str, password: str):
     #     user = get_user(fake_db, username)
     #     if not user:
@@ -82,6 +88,7 @@ class AuthBackend:
                 .values(notification_token=notification_token.notification_token)
             )
             await session.execute(stmt)
+            await session.execute(recipients_changed([user.id]))
             await session.commit()
             return True
         except Exception as e:
@@ -102,6 +109,7 @@ class AuthBackend:
                 .values(notification_token=None, old_notification_token=notification_token)
             )
             await session.execute(stmt)
+            await session.execute(recipients_changed([db_user.id]))
             await session.commit()
             return True
         except Exception as e:
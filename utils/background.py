@@ -0,0 +1,64 @@
+import asyncio
+import traceback
+
+
+class BackgroundDispatcher:
+    # kolejka zadań wykonywanych po odpowiedzi na request, ograniczona
+    # rozmiarem i liczbą równoległych workerów; workery startują leniwie
+    # w pętli zdarzeń, w której pierwszy raz coś zlecono
+    def __init__(self, name: str, concurrency: int, max_queue: int):
+        self._name = name
+        self._concurrency = concurrency
+        self._max_queue = max_queue
+        self._queue = None
+        self._workers = []
+
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._dropped = 0
+
+    def submit(self, func, *args) -> bool:
+        self._ensure_workers()
+        try:
+            self._queue.put_nowait((func, args))
+        except asyncio.QueueFull:
+            self._dropped += 1
+            print(f"[{self._name}] kolejka pełna, pominięto zadanie {func.__name__}")
+            return False
+        self._submitted += 1
+        return True
+
+    async def join(self):
+        # czeka aż wszystkie zlecone zadania się wykonają
+        if self._queue is not None:
+            await self._queue.join()
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "submitted": self._submitted,
+            "completed": self._completed,
+            "failed": self._failed,
+            "dropped": self._dropped,
+        }
+
+    def _ensure_workers(self):
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self._max_queue)
+        for _ in range(self._concurrency):
+            self._workers.append(asyncio.create_task(self._worker()))
+
+    async def _worker(self):
+        while True:
+            func, args = await self._queue.get()
+            try:
+                await func(*args)
+                self._completed += 1
+            except Exception as e:
+                self._failed += 1
+                print(f"[{self._name}] {str(e)}")
+                traceback.print_exc()
+            finally:
+                self._queue.task_done()
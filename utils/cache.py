@@ -0,0 +1,164 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from uuid import uuid4
+
+from utils.env_variables import DATABASE_URL, REDIS_URL, CACHE_MAX_ENTRIES
+
+# kanał LISTEN/NOTIFY, na którym procesy API rozgłaszają zmiany liczników LocalCache
+CACHE_INVALIDATION_CHANNEL = "cache_invalidation"
+BUS_CHECK_INTERVAL = 5
+
+
+class LocalCache:
+    # cache w pamięci procesu, LRU + TTL, wartości muszą być serializowalne do JSON
+    # tak samo jak w RedisCache, żeby oba backendy zachowywały się identycznie
+    def __init__(self, max_entries: int):
+        self._max_entries = max_entries
+        self._data = OrderedDict()
+        # liczniki (np. generacje do unieważniania) nie podlegają LRU,
+        # usunięcie licznika mogłoby "wskrzesić" nieaktualne wpisy
+        self._counters = {}
+        # przy kilku workerach uvicorna zmiany liczników idą do pozostałych procesów
+        self._bus = None
+
+    async def get(self, key: str):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return json.loads(value)
+
+    async def set(self, key: str, value, ttl: int | None = None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        self._data[key] = (json.dumps(value), expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self._max_entries:
+            self._data.popitem(last=False)
+
+    async def get_counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+    async def incr(self, key: str) -> int:
+        value = self.incr_local(key)
+        if self._bus is not None:
+            await self._bus.publish(key)
+        return value
+
+    def incr_local(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+
+class LocalCacheBus:
+    # LocalCache działa w każdym workerze uvicorna osobno; unieważnienie (incr licznika)
+    # w jednym procesie jest rozgłaszane przez LISTEN/NOTIFY postgresa do pozostałych.
+    # Po zerwaniu połączenia nie wiemy co przegapiliśmy, więc wpisy są czyszczone
+    def __init__(self, cache: LocalCache, dsn: str):
+        self._cache = cache
+        self._dsn = dsn
+        self._process_id = uuid4().hex
+        self._connection = None
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    async def start(self):
+        self._cache._bus = self
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._cache._bus = None
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+    async def publish(self, key: str):
+        connection = self._connection
+        if connection is None or connection.is_closed():
+            # pozostałe procesy zobaczą zmianę po ponownym połączeniu (czyszczenie) albo po TTL
+            print(f"Brak połączenia, nie rozgłoszono unieważnienia {key}")
+            return
+        try:
+            async with self._lock:
+                await connection.execute(
+                    "SELECT pg_notify($1, $2)", CACHE_INVALIDATION_CHANNEL, f"{self._process_id}:{key}"
+                )
+        except Exception as e:
+            print(f"Błąd rozgłaszania unieważnienia cache: {str(e)}")
+
+    async def _run(self):
+        import asyncpg
+
+        while True:
+            try:
+                connection = await asyncpg.connect(self._dsn)
+                await connection.add_listener(CACHE_INVALIDATION_CHANNEL, self._on_notify)
+                self._cache.clear()
+                self._connection = connection
+                while not connection.is_closed():
+                    await asyncio.sleep(BUS_CHECK_INTERVAL)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Błąd nasłuchu unieważnień cache: {str(e)}")
+            self._connection = None
+            self._cache.clear()
+            await asyncio.sleep(BUS_CHECK_INTERVAL)
+
+    def _on_notify(self, connection, pid, channel, payload):
+        process_id, key = payload.split(":", 1)
+        if process_id != self._process_id:
+            self._cache.incr_local(key)
+
+
+class RedisCache:
+    # lokalny redis współdzielony przez wszystkich workerów uvicorna,
+    # dzięki temu unieważnienie w jednym procesie widzą pozostałe
+    def __init__(self, url: str):
+        try:
+            from redis import asyncio as aioredis
+        except ImportError:
+            import aioredis
+        self._redis = aioredis.from_url(url)
+
+    async def get(self, key: str):
+        value = await self._redis.get(key)
+        if value is None:
+            return None
+        return json.loads(value)
+
+    async def set(self, key: str, value, ttl: int | None = None):
+        await self._redis.set(key, json.dumps(value), ex=ttl)
+
+    async def get_counter(self, key: str) -> int:
+        return int(await self._redis.get(key) or 0)
+
+    async def incr(self, key: str) -> int:
+        return await self._redis.incr(key)
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self._redis.delete(*keys)
+
+
+if REDIS_URL:
+    cache = RedisCache(REDIS_URL)
+    cache_bus = None
+else:
+    cache = LocalCache(int(CACHE_MAX_ENTRIES))
+    cache_bus = LocalCacheBus(cache, DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://"))
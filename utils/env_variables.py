@@ -21,3 +21,74 @@ UPLOAD_DIR_UNKNOWN = UPLOAD_DIR + os.getenv('UPLOAD_DIR_UNKNOWN')
 UPLOAD_DIR_KNOWN = UPLOAD_DIR + os.getenv('UPLOAD_DIR_KNOWN')
 
 FIREBASE_CERTIFICATE_PATH = os.getenv('FIREBASE_CERTIFICATE_PATH')
+
+
+PASSWORD_HASH_WORKERS = os.getenv('PASSWORD_HASH_WORKERS', 2)
+PASSWORD_HASH_MAX_QUEUE = os.getenv('PASSWORD_HASH_MAX_QUEUE', 64)
+
+REDIS_URL = os.getenv('REDIS_URL')
+CACHE_MAX_ENTRIES = os.getenv('CACHE_MAX_ENTRIES', 10000)
+VIDEOS_CACHE_TTL = os.getenv('VIDEOS_CACHE_TTL', 300)
+# zakładka [s] synchronizacji przyrostowej, dłuższa niż najdłuższa transakcja zapisu nagrania
+VIDEOS_SYNC_OVERLAP = os.getenv('VIDEOS_SYNC_OVERLAP', 60)
+# lista i synchronizacja obejmują nagrania z ostatnich N dni (dolna granica recorded_at,
+# planer pomija starsze partycje); starsze nagrania są dostępne przez /videos/timeline
+VIDEOS_LIST_DAYS = os.getenv('VIDEOS_LIST_DAYS', 90)
+
+FAST_JSON_RESPONSES = os.getenv('FAST_JSON_RESPONSES', 'false').lower() in ('1', 'true', 'yes')
+GZIP_MINIMUM_SIZE = os.getenv('GZIP_MINIMUM_SIZE', 4096)
+# poziom 6 zamiast domyślnego 9 w starlette: ~4x mniej CPU, ~8% większa odpowiedź
+# (benchmarks/video_list_serialization.py, 5000 nagrań)
+GZIP_COMPRESS_LEVEL = os.getenv('GZIP_COMPRESS_LEVEL', 6)
+
+THUMBNAILS_DIR = os.getenv('THUMBNAILS_DIR', UPLOAD_DIR + '/thumbnails')
+THUMBNAIL_SOURCE_DIR = os.getenv('THUMBNAIL_SOURCE_DIR')
+THUMBNAIL_WIDTH = os.getenv('THUMBNAIL_WIDTH', 320)
+THUMBNAIL_FORMAT = os.getenv('THUMBNAIL_FORMAT', 'webp')
+THUMBNAIL_WORKERS = os.getenv('THUMBNAIL_WORKERS', 2)
+
+NOTIFICATION_WORKERS = os.getenv('NOTIFICATION_WORKERS', 2)
+
+# adres lokalnego serwera udającego FCM, puste = prawdziwy Firebase
+FCM_ENDPOINT = os.getenv('FCM_ENDPOINT')
+
+# ile powtórzeń tego samego zapytania w jednym requeście oznaczamy jako N+1
+N_PLUS_ONE_THRESHOLD = os.getenv('N_PLUS_ONE_THRESHOLD', 10)
+# /metrics wymaga nagłówka X-Metrics-Token, bez ustawionego tokenu endpoint zwraca 403
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+# próg logowania wolnych zapytań [ms], puste = wyłączone
+SLOW_QUERY_MS = os.getenv('SLOW_QUERY_MS')
+# profile próbkujące (kill -USR2 <pid> albo /metrics/profile)
+PROFILES_DIR = os.getenv('PROFILES_DIR', UPLOAD_DIR + '/profiles')
+PROFILE_SECONDS = os.getenv('PROFILE_SECONDS', 30)
+PROFILE_INTERVAL_MS = os.getenv('PROFILE_INTERVAL_MS', 10)
+
+# partycje miesięczne videos / files_analyze, retencja 0 = bez archiwizacji
+PARTITION_MONTHS_AHEAD = os.getenv('PARTITION_MONTHS_AHEAD', 3)
+VIDEOS_RETENTION_MONTHS = os.getenv('VIDEOS_RETENTION_MONTHS', 0)
+FILES_ANALYZE_RETENTION_MONTHS = os.getenv('FILES_ANALYZE_RETENTION_MONTHS', 6)
+
+# przyjmowanie klatek do analizy: zaległości workera i limit na kamerę (klatki/s, burst)
+ANALYZE_MAX_QUEUE = os.getenv('ANALYZE_MAX_QUEUE', 500)
+ANALYZE_MAX_TASK_AGE = os.getenv('ANALYZE_MAX_TASK_AGE', 300)
+ANALYZE_BACKLOG_RETRY_AFTER = os.getenv('ANALYZE_BACKLOG_RETRY_AFTER', 30)
+ANALYZE_CAMERA_RATE = os.getenv('ANALYZE_CAMERA_RATE', 1)
+ANALYZE_CAMERA_BURST = os.getenv('ANALYZE_CAMERA_BURST', 10)
+# worker i kontrola przyjęć widzą tylko klatki z ostatnich N sekund (po recorded_at),
+# starsze zostają nieprzeanalizowane, powiadomienie o nich i tak byłoby spóźnione
+ANALYZE_TASK_WINDOW = os.getenv('ANALYZE_TASK_WINDOW', 3600)
+# klatka, na której worker wywraca się tyle razy, jest oznaczana jako przeanalizowana
+ANALYZE_MAX_ATTEMPTS = os.getenv('ANALYZE_MAX_ATTEMPTS', 3)
+
+# wstępna selekcja klatek w workerze: jasność 0-255, wariancja laplasjanu, min. bok twarzy [px]
+FRAME_MIN_BRIGHTNESS = os.getenv('FRAME_MIN_BRIGHTNESS', 40)
+FRAME_MAX_BRIGHTNESS = os.getenv('FRAME_MAX_BRIGHTNESS', 235)
+FRAME_MIN_BLUR_VARIANCE = os.getenv('FRAME_MIN_BLUR_VARIANCE', 30)
+FRAME_MIN_FACE_SIZE = os.getenv('FRAME_MIN_FACE_SIZE', 40)
+
+# nierozpoznana twarz widziana ponownie w tym czasie [s] to to samo zdarzenie (odległość kodowań <= tolerancja)
+UNKNOWN_FACE_TTL = os.getenv('UNKNOWN_FACE_TTL', 300)
+UNKNOWN_FACE_TOLERANCE = os.getenv('UNKNOWN_FACE_TOLERANCE', 0.5)
+# maksymalna długość jednego zdarzenia od pierwszej detekcji [s], potem alarm jest ponawiany
+UNKNOWN_FACE_MAX_DURATION = os.getenv('UNKNOWN_FACE_MAX_DURATION', 900)
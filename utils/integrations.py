@@ -0,0 +1,46 @@
+import threading
+
+
+# ciężkie integracje (firebase, dlib) inicjalizowane dopiero przy pierwszym użyciu,
+# dzięki temu import API/testów nie ładuje ich jako efekt uboczny
+_factories = {}
+_instances = {}
+_lock = threading.Lock()
+
+
+def register(name: str, factory):
+    _factories[name] = factory
+
+
+def get(name: str):
+    if name in _instances:
+        return _instances[name]
+    with _lock:
+        if name not in _instances:
+            _instances[name] = _factories[name]()
+    return _instances[name]
+
+
+def is_loaded(name: str) -> bool:
+    return name in _instances
+
+
+def _init_firebase_messaging():
+    import firebase_admin
+    from firebase_admin import credentials, messaging
+
+    from utils.env_variables import FIREBASE_CERTIFICATE_PATH
+
+    if not firebase_admin._apps:
+        cred = credentials.Certificate(FIREBASE_CERTIFICATE_PATH)
+        firebase_admin.initialize_app(cred)
+    return messaging
+
+
+def _init_face_recognition():
+    import face_recognition
+    return face_recognition
+
+
+register("firebase_messaging", _init_firebase_messaging)
+register("face_recognition", _init_face_recognition)
@@ -0,0 +1,147 @@
+import contextvars
+import time
+from collections import Counter
+
+from sqlalchemy import event
+
+from utils.env_variables import N_PLUS_ONE_THRESHOLD
+
+
+# górne granice kubełków histogramu czasu odpowiedzi [ms], ostatni to +inf
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf'))
+
+# statystyki zapytań bieżącego requestu; event handlery SQLAlchemy dziedziczą kontekst
+# z zadania asyncio (greenlet kopiuje kontekst), więc widzą obiekt ustawiony w middleware
+_current_request = contextvars.ContextVar("current_request_queries", default=None)
+
+
+class RequestQueries:
+    def __init__(self):
+        self.count = 0
+        self.db_time = 0.0
+        self.statements = Counter()
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.db_time += duration
+        self.statements[statement] += 1
+
+    def repeated_statement(self, threshold: int) -> tuple[str, int] | None:
+        # to samo zapytanie (z innymi parametrami) wykonane wiele razy w jednym requeście
+        if not self.statements:
+            return None
+        statement, count = self.statements.most_common(1)[0]
+        return (statement, count) if count >= threshold else None
+
+
+class RouteStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.buckets = [0] * len(LATENCY_BUCKETS_MS)
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.max_queries = 0
+        self.n_plus_one = 0
+
+    def record(self, duration: float, status_code: int, queries: RequestQueries, n_plus_one: bool):
+        self.requests += 1
+        self.errors += status_code >= 500
+        duration_ms = duration * 1000
+        for index, upper_bound in enumerate(LATENCY_BUCKETS_MS):
+            if duration_ms <= upper_bound:
+                self.buckets[index] += 1
+                break
+        self.total_time += duration
+        self.max_time = max(self.max_time, duration)
+        self.queries += queries.count
+        self.db_time += queries.db_time
+        self.max_queries = max(self.max_queries, queries.count)
+        self.n_plus_one += n_plus_one
+
+    def stats(self) -> dict:
+        requests = self.requests or 1
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "latency_ms_buckets": {
+                ('+inf' if upper_bound == float('inf') else str(upper_bound)): count
+                for upper_bound, count in zip(LATENCY_BUCKETS_MS, self.buckets)
+            },
+            "avg_ms": self.total_time / requests * 1000,
+            "max_ms": self.max_time * 1000,
+            "avg_queries": self.queries / requests,
+            "max_queries": self.max_queries,
+            "avg_db_ms": self.db_time / requests * 1000,
+            "n_plus_one": self.n_plus_one,
+        }
+
+
+class RequestMetrics:
+    def __init__(self, n_plus_one_threshold: int):
+        self._n_plus_one_threshold = n_plus_one_threshold
+        self._routes = {}
+
+    def record(self, route: str, duration: float, status_code: int, queries: RequestQueries):
+        repeated = queries.repeated_statement(self._n_plus_one_threshold)
+        if repeated:
+            statement, count = repeated
+            print(f"[N+1] {route}: {count}x {' '.join(statement.split())[:200]}")
+        self._routes.setdefault(route, RouteStats()).record(duration, status_code, queries, repeated is not None)
+
+    def stats(self) -> dict:
+        return {route: route_stats.stats() for route, route_stats in sorted(self._routes.items())}
+
+
+request_metrics = RequestMetrics(n_plus_one_threshold=int(N_PLUS_ONE_THRESHOLD))
+
+
+class MetricsMiddleware:
+    # czyste ASGI zamiast BaseHTTPMiddleware, bez dodatkowego zadania na każdy request
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        queries = RequestQueries()
+        token = _current_request.set(queries)
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started_at = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - started_at
+            _current_request.reset(token)
+            request_metrics.record(self._get_route(scope), duration, status_code, queries)
+
+    @staticmethod
+    def _get_route(scope) -> str:
+        # szablon ścieżki (np. /videos/thumbnail/{hash}), nie surowy URL z hashami
+        route = scope.get("route")
+        path = getattr(route, "path", None) or "unmatched"
+        return f"{scope['method']} {path}"
+
+
+def instrument_engine(sync_engine):
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["query_started_at"].pop()
+        queries = _current_request.get()
+        if queries is not None:
+            queries.record(statement, duration)
@@ -0,0 +1,81 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from utils.env_variables import PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_QUEUE
+
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+class PasswordHasher:
+    # bcrypt celowo jest wolny (dziesiątki-setki ms), dlatego liczymy go w osobnej
+    # puli wątków, bcrypt zwalnia GIL więc wątki wystarczają
+    def __init__(self, workers: int, max_queue: int):
+        self._workers = workers
+        self._max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._semaphore = asyncio.Semaphore(workers)
+
+        self._waiting = 0
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._total_wait_time = 0.0
+        self._total_run_time = 0.0
+
+    async def hash(self, password: str) -> str:
+        return await self._run(pwd_context.hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(pwd_context.verify, plain_password, hashed_password)
+
+    def stats(self) -> dict:
+        completed = self._completed or 1
+        return {
+            "workers": self._workers,
+            "max_queue": self._max_queue,
+            "waiting": self._waiting,
+            "in_flight": self._in_flight,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "avg_wait_ms": self._total_wait_time / completed * 1000,
+            "avg_run_ms": self._total_run_time / completed * 1000,
+        }
+
+    async def _run(self, func, *args):
+        if self._waiting >= self._max_queue:
+            self._rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Serwer jest przeciążony, spróbuj ponownie",
+                headers={"Retry-After": "1"},
+            )
+
+        self._waiting += 1
+        queued_at = time.perf_counter()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+
+        started_at = time.perf_counter()
+        self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self._in_flight -= 1
+            self._completed += 1
+            self._total_wait_time += started_at - queued_at
+            self._total_run_time += time.perf_counter() - started_at
+            self._semaphore.release()
+
+
+password_hasher = PasswordHasher(
+    workers=int(PASSWORD_HASH_WORKERS),
+    max_queue=int(PASSWORD_HASH_MAX_QUEUE),
+)
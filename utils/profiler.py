@@ -0,0 +1,93 @@
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import event
+
+from utils.env_variables import PROFILES_DIR, PROFILE_SECONDS, PROFILE_INTERVAL_MS
+
+
+MAX_PROFILE_SECONDS = 120
+_profile_lock = threading.Lock()
+
+
+class SamplingProfiler:
+    # co interval zrzuca stosy wszystkich wątków przez sys._current_frames(),
+    # bez instrumentacji kodu, więc koszt zależy tylko od częstotliwości próbkowania;
+    # wynik w formacie "collapsed" (flamegraph.pl, speedscope)
+    def __init__(self, interval: float):
+        self._interval = interval
+
+    def run(self, duration: float) -> Counter:
+        stacks = Counter()
+        own_thread_id = threading.get_ident()
+        thread_names = {}
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            for thread in threading.enumerate():
+                thread_names[thread.ident] = thread.name
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread_id:
+                    continue
+                stacks[self._collapse(thread_names.get(thread_id, str(thread_id)), frame)] += 1
+            time.sleep(self._interval)
+        return stacks
+
+    @staticmethod
+    def _collapse(thread_name: str, frame) -> str:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        names.append(thread_name)
+        return ";".join(reversed(names))
+
+
+def write_collapsed(stacks: Counter, name: str) -> str:
+    os.makedirs(PROFILES_DIR, exist_ok=True)
+    path = os.path.join(PROFILES_DIR, f"{name}-{os.getpid()}-{datetime.now():%Y%m%d-%H%M%S}.collapsed")
+    with open(path, "w") as file:
+        for stack, count in stacks.most_common():
+            file.write(f"{stack} {count}\n")
+    return path
+
+
+def profile(name: str, duration: float) -> tuple[str, Counter] | None:
+    # blokujące, wołać z osobnego wątku; None gdy inne profilowanie już trwa
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    try:
+        duration = min(duration, MAX_PROFILE_SECONDS)
+        stacks = SamplingProfiler(int(PROFILE_INTERVAL_MS) / 1000).run(duration)
+        path = write_collapsed(stacks, name)
+        print(f"Zapisano profil {path} ({sum(stacks.values())} próbek)")
+        return path, stacks
+    finally:
+        _profile_lock.release()
+
+
+def install_signal_handler(name: str):
+    # kill -USR2 <pid> profiluje proces przez PROFILE_SECONDS w tle
+    def _handler(signum, frame):
+        threading.Thread(target=profile, args=(name, float(PROFILE_SECONDS)), daemon=True).start()
+
+    signal.signal(signal.SIGUSR2, _handler)
+
+
+def log_slow_queries(sync_engine, threshold_ms: float):
+    threshold = threshold_ms / 1000
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._slow_query_started_at = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - context._slow_query_started_at
+        if duration >= threshold:
+            print(f"[SLOW SQL] {duration * 1000:.1f} ms: {' '.join(statement.split())} | {str(parameters)[:500]}")
@@ -1,48 +1,83 @@
-import traceback, face_recognition, os, multiprocessing, time
+import traceback, os, multiprocessing, time
 from typing import List, Tuple
 
-from models.device import CameraGroupConnector
-from models.video import Video
-from models.user import Group, User, UserGroupConnector
+from sqlalchemy.orm import joinedload, object_session
+
+# relacje modeli są po nazwach klas, worker nie importuje main, więc rejestrujemy je sam
+import models.device, models.video  # noqa: F401
+from models.user import User
 from models.analyze import FilesAnalyze, FacesFromUser
-from db.connector_sync import SessionSync 
+from models.visibility import UserCameraVisibility
+from db.connector_sync import SessionSync, engine_sync
 from services.notifier import NotifierService 
+from services.notification_coalescer import NotificationCoalescer
+from services.notification_recipients import RecipientCache, RecipientChangesListener
+from services.frame_quality import FrameQualityGate, FrameQualityStats
+from services.unknown_faces import RecentUnknownFaces
 from constants.notifications import *
+from utils import integrations
+from utils.profiler import install_signal_handler
+from utils.env_variables import FRAME_MIN_BRIGHTNESS, FRAME_MAX_BRIGHTNESS, FRAME_MIN_BLUR_VARIANCE, FRAME_MIN_FACE_SIZE, \
+    UNKNOWN_FACE_TTL, UNKNOWN_FACE_TOLERANCE, UNKNOWN_FACE_MAX_DURATION, ANALYZE_TASK_WINDOW, ANALYZE_MAX_ATTEMPTS
 
 
 class Analyzer:
+    _quality_gate = FrameQualityGate(
+        min_brightness=float(FRAME_MIN_BRIGHTNESS),
+        max_brightness=float(FRAME_MAX_BRIGHTNESS),
+        min_blur_variance=float(FRAME_MIN_BLUR_VARIANCE),
+        min_face_size=int(FRAME_MIN_FACE_SIZE),
+    )
+
     def worker_job(self, batch_size: int = 5, sleep_time: int = 5):
+        # zadania liczą się w osobnych procesach, stan okien powiadomień musi być wspólny
+        manager = multiprocessing.Manager()
+        self._coalescer = NotificationCoalescer(manager.dict(), manager.Lock())
+        self._recipients = RecipientCache(manager.dict(), manager.Lock())
+        self._frame_quality = FrameQualityStats(manager.dict(), manager.Lock())
+        self._unknown_faces = RecentUnknownFaces(
+            manager.dict(), manager.Lock(), ttl=float(UNKNOWN_FACE_TTL), tolerance=float(UNKNOWN_FACE_TOLERANCE),
+            max_duration=float(UNKNOWN_FACE_MAX_DURATION)
+        )
+        recipient_changes = RecipientChangesListener(engine_sync)
+        install_signal_handler("face_worker")
+        # ładujemy dlib raz w procesie głównym, procesy zadań dziedziczą go przez fork
+        integrations.get("face_recognition")
+
         while True:
+            recipient_changes.apply(self._recipients)
             session = SessionSync()
             try:
-                tasks = (
-                    session.query(FilesAnalyze)
-                    .filter_by(analyzed=False, deleted=False)
+                # (id, recorded_at), czyli pełny klucz główny: zadanie czytane po nim trafia w jedną partycję
+                task_keys = (
+                    session.query(FilesAnalyze.id, FilesAnalyze.recorded_at)
+                    .filter(FilesAnalyze.pending(float(ANALYZE_TASK_WINDOW)))
                     .order_by(FilesAnalyze.recorded_at)
                     .limit(batch_size)
                     .all()
                 )
-                
-                task_ids = [task.id for task in tasks]
                 session.close()
                 
-                if not task_ids:
+                if not task_keys:
                     print("Brak zadań")
+                    self._flush_coalesced_notifications()
                     time.sleep(sleep_time)
                     continue
                 
-                print(f"Znaleziono {len(task_ids)} twarzy do anlizy")
+                print(f"Znaleziono {len(task_keys)} twarzy do anlizy")
                 
                 processes = []
-                for task_id in task_ids:
-                    p = multiprocessing.Process(target=self._process_task, args=(task_id,))
+                for task_id, recorded_at in task_keys:
+                    p = multiprocessing.Process(target=self._process_task, args=(task_id, recorded_at))
                     p.start()
                     processes.append(p)
                 
                 # Czekaj na zakończenie wszystkich procesów
                 for p in processes:
                     p.join()
-                
+
+                self._flush_coalesced_notifications()
+                print(f"Jakość klatek: {self._frame_quality.stats()}")
                 
             except Exception as e:
                 print(f"{str(e)}")
@@ -52,20 +87,18 @@ class Analyzer:
                 time.sleep(sleep_time)
 
     def _load_user_faces_for_camera(self, session: SessionSync, camera_id: int) -> Tuple[List, List]:
+        face_recognition = integrations.get("face_recognition")
         known_encodings = []
         known_metadata = []
 
         faces_query = (
             session.query(FacesFromUser)
-            .join(FacesFromUser.user)
-            .join(User.user_group_connectors)
-            .join(UserGroupConnector.group)
-            .join(Group.cameras_group_connector)
+            .join(UserCameraVisibility, UserCameraVisibility.user_id == FacesFromUser.user_id)
             .filter(
-                CameraGroupConnector.camera_id == camera_id,
+                UserCameraVisibility.camera_id == camera_id,
                 FacesFromUser.deleted == False
             )
-            .distinct()
+            .options(joinedload(FacesFromUser.user))
             .all()
         )
 
@@ -94,13 +127,42 @@ class Analyzer:
 
         return known_encodings, known_metadata
 
-    def _process_task(self, task_id: int):
+    def _process_task(self, task_id: int, recorded_at):
         session = SessionSync()
         try:
-            task = session.query(FilesAnalyze).filter_by(id=task_id).first()
+            task = session.query(FilesAnalyze).filter_by(id=task_id, recorded_at=recorded_at).first()
             if not task:
                 return
 
+            # próba liczona przed analizą, żeby wywrócenie procesu (np. w dlib) też się liczyło;
+            # zadanie wracające na początek kolejki nie może jej blokować w nieskończoność
+            task.attempts += 1
+            if task.attempts > int(ANALYZE_MAX_ATTEMPTS):
+                print(f"Porzucono zadanie {task.id} po {task.attempts - 1} próbach")
+                task.analyzed = True
+                task.reported = False
+                session.commit()
+                return
+            session.commit()
+
+            # odrzucone klatki nie przechodzą przez galerię i enkoder
+            image, face_location, reject_reason = self._quality_gate.check(task.file_path)
+            self._frame_quality.record(reject_reason)
+            if reject_reason:
+                print(f"Odrzucono klatkę ({reject_reason}): {task.file_path}")
+                task.analyzed = True
+                task.reported = False
+                session.commit()
+                return
+
+            unknown_encoding = self._encode_face(image, face_location)
+            if unknown_encoding is None:
+                print("Brak rozpoznania")
+                task.analyzed = True
+                task.reported = False
+                session.commit()
+                return
+
             known_encodings, known_metadata = self._load_user_faces_for_camera(
                 session, 
                 task.camera_id
@@ -116,18 +178,27 @@ class Analyzer:
             match_result = self._compare_and_identify(
                 known_encodings, 
                 known_metadata, 
-                task.file_path,
+                unknown_encoding,
                 tolerance=0.6
             )
 
             task.analyzed = True
             
             if match_result is False:
-                task.reported = True
-                print("---------------------------------")
-                print("             INTRUZ              ")
-                print(f"    {task.file_path}")
-                self._send_notification(task, VIDEO_TYPE_INTRUDER)
+                # ta sama obca osoba co przed chwilą: bez powiadomienia; sprawdzane dopiero po galerii,
+                # żeby domownik podobny do niedawno widzianego obcego nie został wzięty za intruza
+                first_detection_id = self._unknown_faces.match(task.camera_id, unknown_encoding)
+                if first_detection_id is not None:
+                    print(f"Ta sama nieznana osoba co w zadaniu {first_detection_id}")
+                    task.reported = False
+                    task.first_detection_id = first_detection_id
+                else:
+                    self._unknown_faces.add(task.camera_id, unknown_encoding, task.id)
+                    task.reported = True
+                    print("---------------------------------")
+                    print("             INTRUZ              ")
+                    print(f"    {task.file_path}")
+                    self._send_notification(task, VIDEO_TYPE_INTRUDER)
             elif match_result is True:
                 task.reported = True
                 print("---------------------------------")
@@ -153,22 +224,25 @@ class Analyzer:
             session.close()
 
     @staticmethod
-    def _compare_and_identify(known_encodings: List, known_metadata: List, unknown_image_path: str, tolerance: float = 0.6) -> bool | None:
-        # Zwróć boola dla osoby
-        # Zwróć nona dla false positive
-        if not os.path.exists(unknown_image_path):
+    def _encode_face(image, face_location: tuple):
+        # twarz jest już wykryta przez FrameQualityGate, nie wykrywamy jej drugi raz
+        face_recognition = integrations.get("face_recognition")
+        try:
+            encodings = face_recognition.face_encodings(image, known_face_locations=[face_location])
+        except Exception as e:
+            print(f"{str(e)}")
             return None
+        if not encodings:
+            print("Nie znaleziono twarzy na zdjęciu do porównania")
+            return None
+        return encodings[0]
 
+    @staticmethod
+    def _compare_and_identify(known_encodings: List, known_metadata: List, unknown_encoding, tolerance: float = 0.6) -> bool | None:
+        # Zwróć boola dla osoby
+        # Zwróć nona dla false positive
+        face_recognition = integrations.get("face_recognition")
         try:
-            unknown_image = face_recognition.load_image_file(unknown_image_path)
-            unknown_encodings = face_recognition.face_encodings(unknown_image)
-
-            if not unknown_encodings:
-                print("Nie znaleziono twarzy na zdjęciu do porównania")
-                return None
-
-            unknown_encoding = unknown_encodings[0]
-
             results = face_recognition.compare_faces(
                 known_encodings, 
                 unknown_encoding, 
@@ -199,20 +273,50 @@ class Analyzer:
             print(f"{str(e)}")
             return None
 
-    @staticmethod
-    def _send_notification(task, message_type):
-        notification_tokens = set()
-        for camera_group in task.camera.camera_groups:
-            group = camera_group.group
-            
-            for user_group in group.user_group_connectors:
-                user = user_group.user
-                allowed_notifactions = user.get_allowed_notification_types()
-                if user.notification_token and message_type in allowed_notifactions:
-                    notification_tokens.add(user.notification_token)
+    def _get_notification_recipients(self, task) -> List[Tuple[int, str, set]]:
+        # (user_id, token, dozwolone typy) dla użytkowników widzących kamerę,
+        # z cache workera czyszczonego przez RecipientChangesListener
+        recipients = self._recipients.get(task.camera_id)
+        if recipients is not None:
+            return recipients
+
+        users = (
+            object_session(task).query(User)
+            .join(UserCameraVisibility, UserCameraVisibility.user_id == User.id)
+            .filter(UserCameraVisibility.camera_id == task.camera_id)
+            .options(joinedload(User.user_notifications))
+            .all()
+        )
+        recipients = [
+            (user.id, user.notification_token, user.get_allowed_notification_types())
+            for user in users
+            if user.notification_token
+        ]
+        # zapamiętujemy też użytkowników bez tokenu, żeby nadanie tokenu unieważniło wpis
+        self._recipients.store(task.camera_id, [user.id for user in users], recipients)
+        return recipients
+
+    def _send_notification(self, task, message_type):
+        # tokeny pogrupowane po liczbie zdarzeń, żeby wysłać jedną wiadomość na grupę
+        notification_tokens = {}
+        for user_id, token, allowed_notifactions in self._get_notification_recipients(task):
+            if message_type in allowed_notifactions:
+                count = self._coalescer.register(user_id, task.camera_id, message_type, token)
+                if count:
+                    notification_tokens.setdefault(count, set()).add(token)
+
+        for count, tokens in notification_tokens.items():
+            message = NotificationCoalescer.get_message(message_type, count)
+            NotifierService().send_multicast(tokens, "Powiadomienie o detekcji", message)
+
+    def _flush_coalesced_notifications(self):
+        notification_tokens = {}
+        for token, message_type, count in self._coalescer.flush_expired():
+            notification_tokens.setdefault((message_type, count), set()).add(token)
 
-        if len(notification_tokens):
-            message = get_message_by_type(message_type)
-            NotifierService().send_multicast(notification_tokens, "Powiadomienie o detekcji", message)
+        for (message_type, count), tokens in notification_tokens.items():
+            message = NotificationCoalescer.get_message(message_type, count)
+            NotifierService().send_multicast(tokens, "Powiadomienie o detekcji", message)
 
-Analyzer().worker_job(batch_size=1, sleep_time=10)
+if __name__ == '__main__':
+    Analyzer().worker_job(batch_size=1, sleep_time=10)
@@ -0,0 +1,33 @@
+import traceback
+
+from db.connector_sync import SessionSync
+from services.partitions import PartitionService
+from utils.env_variables import PARTITION_MONTHS_AHEAD, VIDEOS_RETENTION_MONTHS, FILES_ANALYZE_RETENTION_MONTHS
+
+
+class PartitionMaintenance:
+    # uruchamiane z crona (np. raz dziennie), każda tabela w osobnej transakcji
+    def run(self):
+        retention = {
+            'videos': int(VIDEOS_RETENTION_MONTHS),
+            'files_analyze': int(FILES_ANALYZE_RETENTION_MONTHS),
+        }
+        for table, retention_months in retention.items():
+            session = SessionSync()
+            try:
+                partition_service = PartitionService(session)
+                created = partition_service.ensure_future_partitions(table, int(PARTITION_MONTHS_AHEAD))
+                # 0 = bez archiwizacji
+                detached = partition_service.detach_old_partitions(table, retention_months) if retention_months else []
+                session.commit()
+                print(f"{table}: utworzono {created or '-'}, zarchiwizowano {detached or '-'}")
+            except Exception as e:
+                session.rollback()
+                print(f"{table}: {str(e)}")
+                traceback.print_exc()
+            finally:
+                session.close()
+
+
+if __name__ == '__main__':
+    PartitionMaintenance().run()